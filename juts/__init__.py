@@ -1,4 +1,71 @@
-from .container import *
-from .widgets import *
-from .interface import *
-from .plotwidgets import *
+"""
+The public names of the submodules are imported on first access, hence
+``import juts`` and the job plumbing (:py:class:`Configuration`,
+:py:class:`Job`, :py:class:`JobScheduler`, the yaml helpers) do not pull in
+ipywidgets, bqplot or IPython.
+"""
+from importlib import import_module
+
+_submodule_names = {
+    "container": [
+        "Configuration", "load_configs_from_file",
+        "load_configs_from_file_upload", "load_configs_from_dict",
+        "get_filename", "dump_configurations", "Result", "ResultBuffer",
+        "LiveResult", "Job", "as_job_list", "JobScheduler", "JobChange",
+        "OutputWidgetHandler", "Hook", "block_signal", "on_unblocked_signal",
+        "log_formatter"],
+    "transport": [
+        "SharedArray", "share_array", "JobReturn", "Checkpoint",
+        "Checkpointer", "LogLines", "LogForwarder", "run_job",
+        "pinned_to_cpus"],
+    "workers": [
+        "ProcessWorker", "PoolWorker", "WorkerPool"],
+    "scheduling": [
+        "FifoPolicy", "PriorityPolicy", "ShortestFirstPolicy",
+        "FairSharePolicy", "JobQueue"],
+    "store": [
+        "ResultStore", "StoredJob", "StoredResult", "StoredArray"],
+    "sweep": [
+        "Sweep", "sweep_jobs"],
+    "cache": [
+        "ResultCache", "job_key"],
+    "checkpoint": [
+        "CheckpointStore"],
+    "remote": [
+        "AgentServer", "WorkerAgent", "RemoteAgent", "RemoteWorker"],
+    "widgets": [
+        "Signal", "ConfigurationView", "ResultView", "JobView",
+        "DownloadView", "PlotView", "ItemList", "PagedItemList", "ConfigList",
+        "FunctionList", "JobList", "QueueJobList", "VisuJobList", "PlotWidgetList",
+        "PlotList", "SchedulerForm", "VisualizerForm", "UserInterfaceForm",
+        "RenderLoop", "get_render_loop", "Plot", "ReplayPanel",
+        "DownloadConfigButton"],
+    "interface": [
+        "SchedulerInterface", "VisualizerInterface", "UserInterface"],
+    "plotwidgets": [
+        "SeriesMatrix", "TimeSeriesPlot", "TimeSeriesReplayPlot"],
+}
+
+_lazy_names = {name: module for module, names in _submodule_names.items()
+               for name in names}
+
+__all__ = list(_lazy_names)
+
+
+def __getattr__(name):
+    if name in _submodule_names:
+        return import_module("." + name, __name__)
+
+    if name in _lazy_names:
+        module = import_module("." + _lazy_names[name], __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+
+        return value
+
+    raise AttributeError("module {!r} has no attribute {!r}".format(
+        __name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__) | set(_submodule_names))
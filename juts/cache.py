@@ -0,0 +1,208 @@
+from .store import ResultStore, StoredJob
+from collections import OrderedDict
+from collections.abc import Mapping
+from numbers import Number
+from threading import Lock
+import numpy as np
+import hashlib
+import inspect
+import shutil
+import json
+import time
+import os
+
+
+class ResultCache:
+    """
+    Content-addressed cache of job results on disk. A job is identified by
+    :py:func:`job_key`, a hash of its function (source code and module) and
+    its canonicalized settings, hence renaming a configuration or queueing
+    it again hits the cache.
+
+    The cache holds at most `max_bytes`, the least recently used results are
+    evicted first.
+
+    Args:
+        directory: Cache directory, one :py:class:`ResultStore` entry per
+            key plus the index `index.json`.
+        max_bytes: Disk quota in bytes, None for no limit.
+    """
+    def __init__(self, directory="juts_cache", max_bytes=2 ** 30):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.store = ResultStore(directory)
+        self.hits = 0
+        self.misses = 0
+        self._lock = Lock()
+        # key -> [size in bytes, time of last use], least recent first
+        self._index = OrderedDict()
+        # hits only update the index in memory, see flush
+        self._dirty = False
+        self.load_index()
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def get_index_file(self):
+        return os.path.join(self.directory, "index.json")
+
+    def load_index(self):
+        try:
+            with open(self.get_index_file(), "r") as f:
+                entries = json.load(f)
+
+        except (OSError, ValueError):
+            entries = dict()
+
+        entries = sorted(entries.items(), key=lambda entry: entry[1][1])
+        self._index = OrderedDict(
+            (key, entry) for key, entry in entries
+            if os.path.isdir(os.path.join(self.directory, key)))
+
+    def dump_index(self):
+        os.makedirs(self.directory, exist_ok=True)
+        filename = self.get_index_file()
+        with open(filename + ".tmp", "w") as f:
+            json.dump(self._index, f)
+        os.replace(filename + ".tmp", filename)
+        self._dirty = False
+
+    def flush(self):
+        """
+        Write the times of last use of the hits since the last write.
+        """
+        with self._lock:
+            if self._dirty:
+                self.dump_index()
+
+    def get_size(self):
+        return sum(size for size, _ in self._index.values())
+
+    size = property(get_size)
+
+    def get(self, key):
+        """
+        Return the cached :py:class:`StoredJob` of `key`, None on a miss.
+        """
+        with self._lock:
+            if key not in self._index:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._index[key][1] = time.time()
+            self._index.move_to_end(key)
+            self._dirty = True
+
+            return StoredJob(os.path.join(self.directory, key))
+
+    def put(self, key, job):
+        """
+        Store the result of the finished `job` under `key` and evict the
+        least recently used results beyond the quota.
+        """
+        with self._lock:
+            directory = os.path.join(self.directory, key)
+            if key in self._index:
+                return
+
+            shutil.rmtree(directory, ignore_errors=True)
+            self.store.save(job, directory)
+            self._index[key] = [directory_size(directory), time.time()]
+            self.evict()
+            self.dump_index()
+
+    def evict(self):
+        while (self.max_bytes is not None and len(self._index) > 1
+               and self.get_size() > self.max_bytes):
+            key, _ = self._index.popitem(last=False)
+            shutil.rmtree(os.path.join(self.directory, key),
+                          ignore_errors=True)
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._index):
+                shutil.rmtree(os.path.join(self.directory, key),
+                              ignore_errors=True)
+            self._index.clear()
+            self.dump_index()
+
+    def stats(self):
+        return dict(hits=self.hits, misses=self.misses, entries=len(self),
+                    size=self.get_size())
+
+
+def job_key(func, config):
+    """
+    Stable hash of the function `func` and the settings of `config`.
+    """
+    digest = hashlib.sha256()
+    digest.update(function_fingerprint(func).encode())
+    digest.update(json.dumps(canonicalize(config.settings),
+                             separators=(",", ":")).encode())
+
+    return digest.hexdigest()
+
+
+def function_fingerprint(func):
+    try:
+        source = inspect.getsource(func)
+
+    except (OSError, TypeError):
+        # e.g. defined in an interactive session without source
+        code = getattr(func, "__code__", None)
+        if code is None:
+            source = repr(func)
+        else:
+            source = repr((code.co_code, code.co_consts, code.co_names))
+
+    return "\n".join([getattr(func, "__module__", None) or "",
+                      getattr(func, "__qualname__", repr(func)),
+                      source])
+
+
+def canonicalize(value):
+    """
+    Convert settings into plain json data, which does not depend on the
+    order of mappings or the container types used.
+    """
+    if isinstance(value, Mapping):
+        return ["map", sorted([str(key), canonicalize(val)]
+                              for key, val in value.items())]
+
+    if isinstance(value, np.ndarray):
+        return ["array", value.dtype.str, list(value.shape),
+                canonicalize(value.tolist())]
+
+    if isinstance(value, (list, tuple)):
+        return ["list", [canonicalize(val) for val in value]]
+
+    if isinstance(value, np.generic):
+        return canonicalize(value.item())
+
+    if isinstance(value, (bool, str)) or value is None:
+        return value
+
+    if isinstance(value, complex):
+        return ["complex", value.real, value.imag]
+
+    if isinstance(value, float) and value.is_integer():
+        # 1 and 1.0 configure the same job
+        value = int(value)
+
+    if isinstance(value, Number):
+        return ["number", repr(value)]
+
+    return ["repr", repr(value)]
+
+
+def directory_size(directory):
+    size = 0
+    for root, _, files in os.walk(directory):
+        for filename in files:
+            size += os.path.getsize(os.path.join(root, filename))
+
+    return size
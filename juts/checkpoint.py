@@ -0,0 +1,125 @@
+from threading import Lock
+import numpy as np
+import shutil
+import pickle
+import json
+import os
+
+
+class CheckpointStore:
+    """
+    Persists the checkpoints of running jobs, see
+    :py:class:`juts.transport.Checkpointer`, in one sub-directory of
+    `directory` per job key (:py:func:`juts.cache.job_key`). A checkpoint
+    consists of the function state and the live results received so far;
+    the results are written incrementally, every checkpoint appends the new
+    samples of each key as a chunk.
+
+    The index `meta.json` is replaced atomically after the chunks and the
+    state are written, hence a crash while saving leaves the previous
+    checkpoint intact.
+    """
+    def __init__(self, directory="juts_checkpoints"):
+        self.directory = directory
+        self._lock = Lock()
+
+    def get_path(self, key):
+        return os.path.join(self.directory, key)
+
+    def __contains__(self, key):
+        return os.path.exists(os.path.join(self.get_path(key), "meta.json"))
+
+    def load_meta(self, key):
+        try:
+            with open(os.path.join(self.get_path(key), "meta.json"), "r") as f:
+                return json.load(f)
+
+        except (OSError, ValueError):
+            return None
+
+    def save(self, key, state, live_result, progress=None):
+        """
+        Save `state` with the samples of `live_result` which are not
+        persisted yet.
+        """
+        with self._lock:
+            path = self.get_path(key)
+            meta = self.load_meta(key)
+            if meta is None:
+                shutil.rmtree(path, ignore_errors=True)
+                os.makedirs(path)
+                meta = dict(n_checkpoints=0, state=None, columns=list())
+
+            n_checkpoint = meta["n_checkpoints"] + 1
+            columns = {column["index"]: column for column in meta["columns"]}
+            for index, result_key in enumerate(live_result):
+                column = columns.setdefault(index, dict(
+                    index=index, key=result_key, length=0, chunks=list()))
+                samples = live_result[result_key][column["length"]:]
+                if len(samples) == 0:
+                    continue
+
+                chunk = self.save_chunk(path, index, n_checkpoint, samples)
+                column["chunks"].append(chunk)
+                column["length"] += len(samples)
+
+            state_file = "state-{}.pkl".format(n_checkpoint)
+            with open(os.path.join(path, state_file), "wb") as f:
+                pickle.dump(state, f)
+
+            old_state_file = meta["state"]
+            meta.update(n_checkpoints=n_checkpoint, state=state_file,
+                        progress=progress,
+                        columns=[columns[i] for i in sorted(columns)])
+            with open(os.path.join(path, "meta.json.tmp"), "w") as f:
+                json.dump(meta, f)
+            os.replace(os.path.join(path, "meta.json.tmp"),
+                       os.path.join(path, "meta.json"))
+
+            if old_state_file is not None:
+                os.remove(os.path.join(path, old_state_file))
+
+    @staticmethod
+    def save_chunk(path, index, n_checkpoint, samples):
+        if samples.dtype == object:
+            chunk = "{}-{}.pkl".format(index, n_checkpoint)
+            with open(os.path.join(path, chunk), "wb") as f:
+                pickle.dump(list(samples), f)
+
+        else:
+            chunk = "{}-{}.npy".format(index, n_checkpoint)
+            np.save(os.path.join(path, chunk), samples)
+
+        return chunk
+
+    def load(self, key):
+        """
+        Return the state, the progress and the live results of the last
+        checkpoint as lists of chunks per key, None if there is none.
+        """
+        with self._lock:
+            meta = self.load_meta(key)
+            if meta is None:
+                return None
+
+            path = self.get_path(key)
+            with open(os.path.join(path, meta["state"]), "rb") as f:
+                state = pickle.load(f)
+
+            columns = list()
+            for column in meta["columns"]:
+                chunks = list()
+                for chunk in column["chunks"]:
+                    filename = os.path.join(path, chunk)
+                    if chunk.endswith(".pkl"):
+                        with open(filename, "rb") as f:
+                            chunks.append(pickle.load(f))
+                    else:
+                        chunks.append(np.load(filename))
+                columns.append((column["key"], chunks))
+
+            return state, meta["progress"], columns
+
+    def remove(self, key):
+        with self._lock:
+            shutil.rmtree(self.get_path(key), ignore_errors=True)
@@ -1,37 +1,56 @@
-from multiprocessing import Process, Queue, Manager, cpu_count
-from yamlordereddictloader import Dumper, Loader
+from .transport import SharedArray, JobReturn, Checkpoint, LogLines
+from .workers import ProcessWorker, WorkerPool
+from .scheduling import JobQueue
+from multiprocessing import cpu_count
 from datetime import datetime as dt
-from collections import OrderedDict
+from collections import OrderedDict, deque
 from collections.abc import Mapping
-from threading import Thread
+from threading import Thread, Condition, Event, Lock, RLock, Timer, \
+    current_thread
 from pprint import pformat
 from numbers import Number
 from codecs import decode
 from queue import Empty
-import ipywidgets as iw
+import numpy as np
 import logging
 import time
-import yaml
+import os
 import io
 
 
 class Configuration:
-    def __init__(self, name, settings):
+    def __init__(self, name, settings, sweep=None):
         self.name = name
         Configuration.validate_settings(settings)
         self.settings = settings
+        # a juts.sweep.Sweep over this configuration
+        self.sweep = sweep
 
     def __repr__(self, *args, **kwargs):
         prt = ("Name: {}\n"
                "Settings:\n{}").format(
             self.name,
             pformat(list(self.settings.items())))
+        if self.sweep is not None:
+            prt += "\nSweep:\n{}".format(pformat(self.sweep.to_dict()))
 
         return prt
 
     def __getitem__(self, item):
         return self.settings[item]
 
+    def expand(self):
+        """
+        Iterate over the configurations of the sweep, just this
+        configuration if there is none.
+        """
+        if self.sweep is None:
+            yield self
+            return
+
+        for index in range(len(self.sweep)):
+            yield self.sweep.get_configuration(self, index)
+
     @staticmethod
     def validate_settings(settings):
         for _name, parameters in settings.items():
@@ -56,12 +75,18 @@ class Configuration:
 
 
 def load_configs_from_file(filename):
+    import yaml
+    from yamlordereddictloader import Loader
+
     with open(filename, "r") as f:
         configs = yaml.load(f, Loader=Loader)
 
     return load_configs_from_dict(configs)
 
 def load_configs_from_file_upload(file_upload):
+    import yaml
+    from yamlordereddictloader import Loader
+
     configs = list()
     for file in file_upload.value:
         stream = io.StringIO(decode(file.content))
@@ -72,7 +97,21 @@ def load_configs_from_file_upload(file_upload):
 
 
 def load_configs_from_dict(configs):
-    return [Configuration(name, setting) for name, setting in configs.items()]
+    """
+    Create a configuration per top-level key of `configs`. The reserved
+    parameter set "sweep" is passed on to :py:class:`juts.sweep.Sweep`.
+    """
+    from .sweep import Sweep
+
+    config_list = list()
+    for name, setting in configs.items():
+        sweep = None
+        if "sweep" in setting:
+            setting = OrderedDict(setting)
+            sweep = Sweep.from_dict(setting.pop("sweep"))
+        config_list.append(Configuration(name, setting, sweep))
+
+    return config_list
 
 
 def get_filename(fix, ending, post=""):
@@ -84,13 +123,18 @@ def get_filename(fix, ending, post=""):
             f"%Y-%d-%m-{fix}-%H-%M-%S.{ending}")
 
 
-Dumper.ignore_aliases = lambda *args : True
-
-
 def dump_configurations(filename, configs):
+    import yaml
+    from yamlordereddictloader import Dumper
+
+    Dumper.ignore_aliases = lambda *args : True
     _configs = dict()
     for config in configs:
-        _configs.update({config.name: config.settings})
+        settings = config.settings
+        if config.sweep is not None:
+            settings = OrderedDict(settings)
+            settings["sweep"] = config.sweep.to_dict()
+        _configs.update({config.name: settings})
 
     with open(filename, "w") as f:
         yaml.dump(_configs, f, Dumper=Dumper, default_flow_style=False)
@@ -105,13 +149,217 @@ class Result(OrderedDict):
         super().__init__(result)
 
 
+class ResultBuffer:
+    """
+    Column of live result samples, stored in a preallocated numpy array
+    which grows geometrically. Dtype and sample shape are inferred from the
+    first sample; the column is promoted to a wider dtype or to dtype object
+    if a later sample does not fit.
+    """
+    min_capacity = 64
+
+    def __init__(self, sample, dtype=None):
+        if dtype is None:
+            dtype, shape = ResultBuffer.infer_layout(sample)
+        else:
+            shape = tuple()
+        self._data = np.empty((ResultBuffer.min_capacity,) + shape, dtype)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def dtype(self):
+        return self._data.dtype
+
+    @property
+    def sample_shape(self):
+        return self._data.shape[1:]
+
+    @staticmethod
+    def infer_layout(sample):
+        try:
+            array = np.asarray(sample)
+        except ValueError:
+            # ragged sequences
+            return np.dtype(object), tuple()
+
+        if array.dtype.kind not in "biufc":
+            return np.dtype(object), tuple()
+
+        return array.dtype, array.shape
+
+    def view(self):
+        size = self._size
+        return self._data[:size]
+
+    def append(self, sample):
+        if self.dtype != object:
+            try:
+                array = np.asarray(sample)
+            except ValueError:
+                array = None
+
+            if (array is None or array.shape != self.sample_shape
+                    or array.dtype.kind not in "biufc"):
+                self.relayout(np.dtype(object))
+
+            elif not np.can_cast(array.dtype, self.dtype, "same_kind"):
+                self.relayout(np.result_type(self.dtype, array.dtype))
+
+        self.reserve(self._size + 1)
+        self._data[self._size] = sample
+        self._size += 1
+
+    def extend(self, samples):
+        if self.dtype == object or len(samples) == 0:
+            for sample in samples:
+                self.append(sample)
+            return
+
+        try:
+            array = np.asarray(samples)
+        except ValueError:
+            array = None
+
+        if (array is None or array.shape[1:] != self.sample_shape
+                or array.dtype.kind not in "biufc"):
+            for sample in samples:
+                self.append(sample)
+            return
+
+        if not np.can_cast(array.dtype, self.dtype, "same_kind"):
+            self.relayout(np.result_type(self.dtype, array.dtype))
+
+        self.reserve(self._size + len(array))
+        self._data[self._size:self._size + len(array)] = array
+        self._size += len(array)
+
+    def reserve(self, size):
+        capacity = len(self._data)
+        if size <= capacity:
+            return
+
+        while capacity < size:
+            capacity *= 2
+
+        data = np.empty((capacity,) + self.sample_shape, self.dtype)
+        data[:self._size] = self._data[:self._size]
+        self._data = data
+
+    def relayout(self, dtype):
+        if dtype == object:
+            data = np.empty(len(self._data), object)
+            for i in range(self._size):
+                data[i] = self._data[i]
+        else:
+            data = self._data.astype(dtype)
+
+        self._data = data
+
+    def to_array(self):
+        if self.dtype == object:
+            return ResultBuffer.stack_objects(self.view())
+
+        return np.array(self.view())
+
+    @staticmethod
+    def stack_objects(objects):
+        if not all(isinstance(obj, np.ndarray) for obj in objects):
+            return np.array(objects)
+
+        if len(set(obj.shape for obj in objects)) == 1:
+            return np.stack(objects)
+
+        array = np.empty(len(objects), object)
+        for i, obj in enumerate(objects):
+            array[i] = np.array(obj)
+
+        return array
+
+
+class LiveResult(Mapping):
+    """
+    Columnar store for the live results of a running job. Every key is
+    backed by a :py:class:`ResultBuffer`, readers get array views on the
+    samples received so far.
+
+    Values which arrive as :py:class:`SharedArray` handles are copied out
+    of their shared memory segments, which are unlinked right away; hence
+    a job holds no file descriptor per received sample.
+    """
+    def __init__(self):
+        self._buffers = OrderedDict()
+        # bumped when a key is added or the dtype or shape of a key changes
+        self.schema_version = 0
+
+    def __getitem__(self, key):
+        return self._buffers[key].view()
+
+    def __iter__(self):
+        return iter(list(self._buffers))
+
+    def __len__(self):
+        return len(self._buffers)
+
+    def __contains__(self, key):
+        return key in self._buffers
+
+    def append(self, status):
+        self.extend(OrderedDict(
+            [(key, [value]) for key, value in status.items()]))
+
+    def extend(self, columns):
+        for key, values in columns.items():
+            layout = self.get_layout(key)
+            if any(isinstance(value, SharedArray) for value in values):
+                values = [self.attach(value) for value in values]
+                if key not in self._buffers:
+                    self._buffers[key] = ResultBuffer(None, dtype=object)
+
+            elif key not in self._buffers:
+                self._buffers[key] = ResultBuffer(values[0])
+
+            self._buffers[key].extend(values)
+            if self.get_layout(key) != layout:
+                self.schema_version += 1
+
+    def get_layout(self, key):
+        buffer = self._buffers.get(key)
+        if buffer is None:
+            return None
+
+        return buffer.dtype, buffer.sample_shape
+
+    def attach(self, value):
+        if not isinstance(value, SharedArray):
+            return value
+
+        return value.load()
+
+    def release(self):
+        self._buffers = OrderedDict()
+
+    def to_result(self):
+        return Result(OrderedDict([
+            (key, buffer.to_array()) for key, buffer in self._buffers.items()
+        ]))
+
+
 log_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
 
 
 class Job(Thread):
     job_count = 0
-
-    def __init__(self, func, config, name=None):
+    # lines of the log which are kept in memory, see OutputWidgetHandler
+    max_log_lines = 1000
+
+    def __init__(self, func, config, name=None, queue_timeout=.5,
+                 max_batch_size=1000, worker_pool=None, priority=0,
+                 expected_runtime=None, group=None, n_cpus=1, memory=0,
+                 wall_time_limit=None, cpu_time_limit=None,
+                 checkpoint_store=None):
         self.job_index = Job.job_count
         Job.job_count += 1
         # since self.is_alive() returns False before self.start()
@@ -131,25 +379,71 @@ class Job(Thread):
 
         self._result = Result()
 
-        progress_layout = iw.Layout(width="auto")
-        self.progress = iw.FloatProgress(value=0,
-                                         min=0,
-                                         max=100,
-                                         bar_style='info',
-                                         orientation='horizontal',
-                                         layout=progress_layout)
-
-        self.job_finished = Signal()
-        self.live_result_update = Signal()
-
-        self.logger = logging.getLogger(str(hash(self)))
+        # latency and throughput of the multiprocessing queue drain
+        self.queue_timeout = queue_timeout
+        self.max_batch_size = max(1, max_batch_size)
+
+        # run in a warm worker of this pool instead of a fresh process
+        self.worker_pool = worker_pool
+
+        # used by the scheduling policies of the job queue
+        self.priority = priority
+        self.expected_runtime = expected_runtime
+        self.group = group
+
+        # resources to reserve, memory in bytes; the scheduler assigns
+        # `cpus` and decides whether the worker is pinned to them
+        self.n_cpus = n_cpus
+        self.memory = memory
+        self.cpus = None
+        self.pin_cpus = False
+        # a juts.remote.RemoteAgent, which runs the job instead
+        self.agent = None
+
+        # headless state, the widgets are created when the job is displayed
+        self.progress_value = 0
+        self.progress_style = "info"
+        self._progress = None
+
+        self.job_finished = Hook()
+        self.job_lost = Hook()
+        self.live_result_update = Hook()
+
+        # not registered at the logging module, hence freed with the job
+        self.logger = logging.Logger("juts.job.{}".format(self.job_index))
         self.logger.setLevel(logging.INFO)
-        self.log_handler = OutputWidgetHandler()
+        self.log_handler = OutputWidgetHandler(max_lines=self.max_log_lines)
         self.log_handler.setLevel(logging.INFO)
         self.log_handler.setFormatter(log_formatter)
         self.logger.addHandler(self.log_handler)
 
-        self._live_result = Result()
+        self._live_result = LiveResult()
+        self._return_dict = None
+        # bumped when a result key is added, a key changes its type or
+        # shape, or the result is replaced, e.g. when the job finishes
+        self.schema_version = 0
+        self._live_schema_version = 0
+
+        # set once the result is saved in a result store
+        self.directory = None
+        # set by a scheduler with a result cache
+        self.cache_key = None
+
+        # limits in seconds, enforced by the scheduler
+        self.wall_time_limit = wall_time_limit
+        self.cpu_time_limit = cpu_time_limit
+        self.start_time = None
+        self.cancelled = False
+        self.cancel_reason = None
+        self._cancel_event = Event()
+        self._worker = None
+        self._start_cpu_time = None
+
+        # a juts.checkpoint.CheckpointStore, the checkpoints of the job
+        # function are saved under `checkpoint_key`
+        self.checkpoint_store = checkpoint_store
+        self.checkpoint_key = None
+        self._completed = False
 
     def get_func(self):
         return self._func
@@ -161,6 +455,31 @@ class Job(Thread):
 
     config = property(get_config)
 
+    def get_progress(self):
+        if self._progress is None:
+            import ipywidgets as iw
+
+            progress_layout = iw.Layout(width="auto")
+            self._progress = iw.FloatProgress(value=self.progress_value,
+                                              min=0,
+                                              max=100,
+                                              bar_style=self.progress_style,
+                                              orientation='horizontal',
+                                              layout=progress_layout)
+
+        return self._progress
+
+    progress = property(get_progress)
+
+    def set_progress(self, value, bar_style=None):
+        self.progress_value = value
+        if bar_style is not None:
+            self.progress_style = bar_style
+
+        if self._progress is not None:
+            self._progress.value = value
+            self._progress.bar_style = self.progress_style
+
     def get_result(self):
         if self.job_is_alive:
             return self._live_result
@@ -172,61 +491,373 @@ class Job(Thread):
 
     def process_queue_get(self, process_queue):
         try:
-            status = process_queue.get(timeout=.5)
+            batch = [process_queue.get(timeout=self.queue_timeout)]
 
         except Empty:
-            status = dict()
             self.logger.warning("multiprocesssing queue timout")
+            return
+
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(process_queue.get_nowait())
+
+            except Empty:
+                break
+
+        # the samples before a checkpoint belong to it
+        statuses = list()
+        for status in batch:
+            if isinstance(status, JobReturn):
+                self._return_dict = status.return_dict
+                self._completed = status.completed
+
+            elif isinstance(status, Checkpoint):
+                self.apply_status_batch(statuses)
+                statuses = list()
+                self.save_checkpoint(status.state)
+
+            elif isinstance(status, LogLines):
+                self.log_worker_lines(status)
+
+            else:
+                statuses.append(status)
+
+        self.apply_status_batch(statuses)
 
-        if "progress" in status:
-            self.progress.value = status.pop("progress")
+    def log_worker_lines(self, log_lines):
+        for created, levelno, text in log_lines.lines:
+            self.logger.handle(logging.makeLogRecord(dict(
+                name=self.logger.name, levelno=levelno,
+                levelname=logging.getLevelName(levelno), msg=text,
+                created=created, msecs=(created % 1) * 1000)))
 
-        if status:
-            self.update_live_results(status)
-            self.live_result_update()
+        if log_lines.n_dropped:
+            self.logger.warning("{} lines of the worker dropped".format(
+                log_lines.n_dropped))
 
-    def update_live_results(self, status):
-        for key, value in status.items():
-            if key not in self._live_result:
-                self._live_result[key] = list()
+    def apply_status_batch(self, batch):
+        progress, columns = Job.merge_status_batch(batch)
 
-            self._live_result[key].append(value)
+        if progress is not None:
+            self.set_progress(progress)
+
+        if columns:
+            self.update_live_results(columns)
+            self.live_result_update(columns)
+
+    @staticmethod
+    def merge_status_batch(batch):
+        progress = None
+        columns = OrderedDict()
+        for status in batch:
+            for key, value in status.items():
+                if key == "progress":
+                    progress = value
+
+                else:
+                    columns.setdefault(key, list()).append(value)
+
+        return progress, columns
+
+    def update_live_results(self, columns):
+        self._live_result.extend(columns)
+        self.update_schema_version()
+
+    def update_schema_version(self):
+        if self._live_result.schema_version != self._live_schema_version:
+            self._live_schema_version = self._live_result.schema_version
+            self.schema_version += 1
 
     def run(self):
-        process_queue = Queue()
-        manager = Manager()
-        return_dict = manager.dict()
         self.logger.info("initialize process")
-        process = Process(target=self.func,
-                          args=(self.config,),
-                          kwargs=dict(return_dict=return_dict,
-                                      process_queue=process_queue))
-        self.logger.info("start process")
-        process.start()
-
-        while process.is_alive():
-            self.process_queue_get(process_queue)
+        self.start_time = time.monotonic()
+        if self.agent is not None:
+            worker = self.agent.acquire()
+        elif self.worker_pool is None:
+            worker = ProcessWorker()
+        else:
+            worker = self.worker_pool.acquire()
+        self._start_cpu_time = worker.cpu_time()
+        self._worker = worker
+        resume_state = self.resume_from_checkpoint()
+        if self.cpus and self.pin_cpus:
+            self.logger.info("start process on cpus {}".format(self.cpus))
+            worker.submit(self.func, self.config, self.cpus, resume_state)
+        else:
+            self.logger.info("start process")
+            worker.submit(self.func, self.config, resume_state=resume_state)
+
+        while (worker.is_alive() and self._return_dict is None
+               and not self._cancel_event.is_set()):
+            self.process_queue_get(worker.process_queue)
+
+        if self._return_dict is None and self._cancel_event.is_set():
+            self.terminate(worker)
+            return
+
+        if self._return_dict is None and worker.lost:
+            self.logger.warning("worker lost, requeue job")
+            worker.release()
+            self.reset()
+            self.job_lost(self)
+            return
         self.logger.info("process finished")
 
-        while not process_queue.empty():
-            self.process_queue_get(process_queue)
+        while not worker.process_queue.empty():
+            self.process_queue_get(worker.process_queue)
         self.logger.info("queue empty")
 
         self.logger.info("fetch results")
-        if len(return_dict) > 0:
-            self._result = Result(OrderedDict(return_dict))
+        if self._return_dict:
+            self._result = Result(OrderedDict(self._return_dict))
 
         else:
-            self._result = Result(OrderedDict(self._live_result))
+            self._result = self._live_result.to_result()
 
         self.logger.info("join process")
-        process.join()
+        worker.release()
 
-        self.progress.bar_style = "success"
-        self.progress.value = 100
-        self.job_finished(self.job_index)
+        if self._completed:
+            if self.checkpoint_store is not None:
+                self.checkpoint_store.remove(self.checkpoint_key)
+            self.set_progress(100, "success")
 
+        else:
+            self.logger.error("job function failed")
+            self.set_progress(self.progress_value, "danger")
+        self._worker = None
         self.job_is_alive = False
+        self.schema_version += 1
+        self.job_finished(self)
+
+        self._live_result.release()
+
+    def reset(self):
+        """
+        Drop the progress and the results, to run the job again.
+        """
+        self._live_result.release()
+        self._live_result = LiveResult()
+        self._live_schema_version = 0
+        self.schema_version += 1
+        self._return_dict = None
+        self._completed = False
+        self._worker = None
+        self.start_time = None
+        self.set_progress(0, "info")
+
+    def renew_thread(self):
+        """
+        Make the finished thread of a reset job startable again.
+        """
+        if self.is_alive():
+            raise RuntimeError("Job is still running.")
+
+        Thread.__init__(self, name=self.name, daemon=self.daemon)
+
+    def resume_from_checkpoint(self):
+        """
+        Restore the live results of the last checkpoint and return the
+        state to resume the job function with, None if there is none.
+        """
+        if self.checkpoint_store is None:
+            return None
+
+        if self.checkpoint_key is None:
+            from .cache import job_key
+
+            self.checkpoint_key = self.cache_key or job_key(self.func,
+                                                            self.config)
+
+        checkpoint = self.checkpoint_store.load(self.checkpoint_key)
+        if checkpoint is None:
+            return None
+
+        state, progress, columns = checkpoint
+        self.logger.info("resume from checkpoint")
+        for key, chunks in columns:
+            for chunk in chunks:
+                self._live_result.extend(OrderedDict([(key, chunk)]))
+        self.update_schema_version()
+        if progress is not None:
+            self.set_progress(progress)
+
+        return state
+
+    def save_checkpoint(self, state):
+        if self.checkpoint_store is None:
+            return
+
+        self.checkpoint_store.save(self.checkpoint_key, state,
+                                   self._live_result, self.progress_value)
+
+    def terminate(self, worker):
+        self.logger.warning("{}, terminate process".format(self.cancel_reason))
+        worker.terminate()
+        self._worker = None
+        self.cancelled = True
+
+        # keep what was received so far
+        self._result = self._live_result.to_result()
+        self.set_progress(self.progress_value, "danger")
+        self.job_is_alive = False
+        self.schema_version += 1
+        self.job_finished(self)
+
+        self._live_result.release()
+
+    def cancel(self, reason="cancelled"):
+        """
+        Terminate the worker of the running job, which then finishes as
+        cancelled with the results received so far.
+        """
+        if self.cancel_reason is None:
+            self.cancel_reason = reason
+        self._cancel_event.set()
+
+    def get_scheduling_kwargs(self):
+        """
+        Keyword arguments of :py:class:`Job` which control how the job is
+        scheduled, to create jobs which are scheduled alike.
+        """
+        return dict(priority=self.priority,
+                    expected_runtime=self.expected_runtime,
+                    group=self.group, n_cpus=self.n_cpus, memory=self.memory,
+                    wall_time_limit=self.wall_time_limit,
+                    cpu_time_limit=self.cpu_time_limit)
+
+    def get_wall_time(self):
+        if self.start_time is None:
+            return 0.
+
+        return time.monotonic() - self.start_time
+
+    def get_cpu_time(self):
+        worker = self._worker
+        if worker is None:
+            return None
+
+        cpu_time = worker.cpu_time()
+        if cpu_time is None:
+            return None
+
+        return cpu_time - (self._start_cpu_time or 0.)
+
+    def exceeded_limit(self):
+        """
+        Reason for cancelling the job if it exceeds one of its limits,
+        None otherwise.
+        """
+        if (self.wall_time_limit is not None
+                and self.get_wall_time() > self.wall_time_limit):
+            return "wall-clock time limit exceeded"
+
+        if self.cpu_time_limit is not None:
+            cpu_time = self.get_cpu_time()
+            if cpu_time is not None and cpu_time > self.cpu_time_limit:
+                return "cpu time limit exceeded"
+
+        return None
+
+    def set_cached_result(self, stored_job):
+        """
+        Finish the job, which was not started, with the result of
+        `stored_job`.
+        """
+        self.logger.info("load result from cache")
+        self._result = stored_job.result
+        self.set_progress(100, "success")
+        self.job_is_alive = False
+        self.schema_version += 1
+        self.job_finished(self)
+
+    def set_cancelled(self, reason="cancelled"):
+        """
+        Finish the job, which was not started, as cancelled without results.
+        """
+        if self.cancel_reason is None:
+            self.cancel_reason = reason
+        self.cancelled = True
+        self._result = self._live_result.to_result()
+        self.set_progress(self.progress_value, "danger")
+        self.job_is_alive = False
+        self.schema_version += 1
+        self.job_finished(self)
+
+    def discard(self):
+        self._live_result.release()
+        self.log_handler.close()
+
+    async def wait(self):
+        """
+        Wait, without blocking the event loop, until the job is done and
+        return its result.
+        """
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        finished = loop.create_future()
+
+        def on_finished(job):
+            call_soon_threadsafe(loop, set_future_result, finished, None)
+
+        self.job_finished.connect(on_finished)
+        try:
+            if self.job_is_alive:
+                await finished
+        finally:
+            self.job_finished.disconnect(on_finished)
+
+        return self.result
+
+    async def stream(self):
+        """
+        Asynchronously iterate over the batches of live results, as mappings
+        from the result keys to lists of new samples, until the job is done.
+        """
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        batches = asyncio.Queue()
+        done = object()
+
+        def on_update(columns=None):
+            if columns:
+                call_soon_threadsafe(loop, batches.put_nowait, columns)
+
+        def on_finished(job):
+            call_soon_threadsafe(loop, batches.put_nowait, done)
+
+        self.live_result_update.connect(on_update)
+        self.job_finished.connect(on_finished)
+        try:
+            if not self.job_is_alive:
+                batches.put_nowait(done)
+
+            while True:
+                batch = await batches.get()
+                if batch is done:
+                    return
+
+                yield batch
+
+        finally:
+            self.live_result_update.disconnect(on_update)
+            self.job_finished.disconnect(on_finished)
+
+
+def call_soon_threadsafe(loop, callback, *args):
+    try:
+        loop.call_soon_threadsafe(callback, *args)
+
+    except RuntimeError:
+        # the event loop is closed
+        pass
+
+
+def set_future_result(future, result):
+    if not future.done():
+        future.set_result(result)
 
 
 def as_job_list(config_list):
@@ -239,109 +870,660 @@ def as_job_list(config_list):
 
 
 class JobScheduler(Thread):
-    def __init__(self):
-        super().__init__()
-        self.sync_queue = Signal()
-        self.sync_busy = Signal()
-        self.sync_done = Signal()
-
-        self.queue_jobs = list()
+    """
+    Runs queued jobs in parallel, either each in a fresh process or, in pool
+    mode, in a set of warm worker processes which keep modules loaded
+    between jobs.
+
+    Jobs are packed into the free capacity by their `n_cpus` and `memory`
+    requirements: the first of the next `packing_lookahead` queued jobs
+    which fits is started, pinned to a disjoint set of cpus. A job which
+    needs more than the whole capacity runs alone.
+
+    Busy jobs which exceed their `wall_time_limit` or `cpu_time_limit` are
+    cancelled: the worker is terminated and the job is done as `cancelled`.
+
+    Args:
+        policy: Scheduling policy of the job queue, see
+            :py:mod:`juts.scheduling`, defaults to FIFO.
+        pool: Enable pool mode, the pool is sized by `available_kernels`.
+        max_jobs_per_worker: Recycle a pool worker after this number of jobs.
+        max_worker_memory: Recycle a pool worker once its resident memory
+            exceeds this number of bytes.
+        result_cache: A :py:class:`juts.cache.ResultCache`, queued jobs
+            whose function and settings are cached are moved to the done
+            jobs right away, the results of all others are cached.
+        checkpoint_store: A :py:class:`juts.checkpoint.CheckpointStore`
+            for the jobs which have none.
+    """
+    def __init__(self, policy=None, pool=False, max_jobs_per_worker=None,
+                 max_worker_memory=None, result_cache=None,
+                 checkpoint_store=None):
+        super().__init__(daemon=True)
+        self.sync_queue = Hook()
+        self.sync_busy = Hook()
+        self.sync_done = Hook()
+        # called with a JobChange for every change of the job lists
+        self.job_change = Hook()
+
+        self.queue_jobs = JobQueue(policy)
         self.busy_jobs = list()
         self.done_jobs = list()
 
         self.is_running = False
+        self.is_shut_down = False
+        # guards the job lists, notified on every event which may allow to
+        # dispatch jobs: enqueue, job finished, kernel change and play
+        self._condition = Condition(RLock())
+        self._dispatch_pending = True
+
+        if pool:
+            self.worker_pool = WorkerPool(
+                max_jobs_per_worker=max_jobs_per_worker,
+                max_worker_memory=max_worker_memory)
+        else:
+            self.worker_pool = None
 
-        self.max_kernels = cpu_count()
+        self.cpu_ids = get_cpu_ids()
+        self.pin_cpus = hasattr(os, "sched_setaffinity")
+        self.max_kernels = len(self.cpu_ids)
         self.available_kernels = self.max_kernels
+        self.max_memory = get_physical_memory()
+        self.packing_lookahead = 64
+        self.result_cache = result_cache
+        self.checkpoint_store = checkpoint_store
+        # juts.remote.RemoteAgent instances, connected by an AgentServer
+        self.agents = list()
+        # seconds between checks of the time limits of the busy jobs
+        self.limit_check_interval = .5
+
+    def get_available_kernels(self):
+        return self._available_kernels
+
+    def set_available_kernels(self, n_kernels):
+        self._available_kernels = n_kernels
+        if self.worker_pool is not None:
+            self.worker_pool.resize(n_kernels)
+        self.wake()
+
+    available_kernels = property(get_available_kernels, set_available_kernels)
+
+    async def submit(self, func, config, **kwargs):
+        """
+        Queue a new :py:class:`Job` of `func` and `config` from a coroutine
+        and return it, the keyword arguments are passed on to the job::
+
+            job = await scheduler.submit(func, config)
+            async for batch in job.stream():
+                ...
+            result = await job.wait()
+        """
+        job = Job(func, config, **kwargs)
+        self.append_queue_job(job)
+
+        return job
+
+    def get_queue_jobs(self):
+        """
+        Return the queued jobs in dispatch order. Unlike iterating
+        `queue_jobs`, the copy is taken under the lock, hence it is safe
+        while the scheduler dispatches jobs.
+        """
+        with self._condition:
+            return list(self.queue_jobs)
 
     def append_queue_job(self, job):
-        self.queue_jobs.append(job)
+        if (self.result_cache is not None
+                and not self.load_cached_results([job])):
+            return
+
+        with self._condition:
+            self.queue_jobs.append(job)
+            self._notify()
+        self.job_change(JobChange("inserted", [job], "queue"))
         self.sync_queue()
 
+    def extend_queue_jobs(self, jobs):
+        """
+        Queue many jobs at once, e.g. of a :py:class:`juts.sweep.Sweep`,
+        with a single notification of the scheduler and the interface.
+        """
+        jobs = list(jobs)
+        if self.result_cache is not None:
+            jobs = self.load_cached_results(jobs)
+        if not jobs:
+            return
+
+        with self._condition:
+            self.queue_jobs.extend(jobs)
+            self._notify()
+        self.job_change(JobChange("inserted", jobs, "queue"))
+        self.sync_queue()
+
+    def load_cached_results(self, jobs):
+        """
+        Finish the jobs whose results are cached, which are moved to the
+        done jobs at once, and return the other ones.
+        """
+        from .cache import job_key
+
+        hits = list()
+        misses = list()
+        for job in jobs:
+            job.cache_key = job_key(job.func, job.config)
+            stored_job = self.result_cache.get(job.cache_key)
+            if stored_job is None:
+                misses.append(job)
+            else:
+                job.set_cached_result(stored_job)
+                hits.append(job)
+        self.result_cache.flush()
+
+        if hits:
+            with self._condition:
+                self.done_jobs.extend(hits)
+            self.job_change(JobChange("inserted", hits, "done"))
+            self.sync_done()
+
+        return misses
+
     def pop_queue_job(self, index):
-        job = self.queue_jobs.pop(index)
+        with self._condition:
+            job = self.queue_jobs.pop(index)
+        job.set_cancelled("removed from queue")
+        self.job_change(JobChange("removed", [job], "queue"))
         self.sync_queue()
 
         return job
 
+    def remove_queue_job(self, job):
+        """
+        Remove `job` from the queue, it finishes as cancelled. Nothing is
+        done if the job already left the queue.
+        """
+        with self._condition:
+            if job not in self.queue_jobs:
+                return
+
+            self.queue_jobs.remove(job)
+        job.set_cancelled("removed from queue")
+        self.job_change(JobChange("removed", [job], "queue"))
+        self.sync_queue()
+
+    def cancel_job(self, job):
+        """
+        Cancel a queued or busy job. A busy job is moved to the done jobs
+        once its worker is terminated, hence its cpus are not reused before.
+        """
+        with self._condition:
+            queued = job in self.queue_jobs
+            if queued:
+                self.queue_jobs.remove(job)
+                self.done_jobs.append(job)
+
+            elif job in self.busy_jobs:
+                job.cancel()
+
+        if queued:
+            job.set_cancelled()
+            self.job_change(JobChange("moved", [job], "queue", "done"))
+            self.sync_queue()
+            self.sync_done()
+
     def pop_busy_job(self, index):
-        job = self.busy_jobs.pop(index)
+        with self._condition:
+            job = self.busy_jobs.pop(index)
+            self._notify()
+        self.job_change(JobChange("removed", [job], "busy"))
         self.sync_busy()
 
         return job
 
+    def remove_done_job(self, job):
+        with self._condition:
+            if job not in self.done_jobs:
+                return
+
+            self.done_jobs.remove(job)
+        self.job_change(JobChange("removed", [job], "done"))
+        self.sync_done()
+
+    def set_policy(self, policy):
+        with self._condition:
+            self.queue_jobs.set_policy(policy)
+            jobs = list(self.queue_jobs)
+        # reordered
+        self.job_change(JobChange("moved", jobs, "queue", "queue"))
+        self.sync_queue()
+
     def start_queue(self):
         self.is_running = True
+        self.wake()
 
     def pause_queue(self):
         self.is_running = False
+        self.wake()
+
+    def wake(self):
+        with self._condition:
+            self._notify()
+
+    def _notify(self):
+        self._dispatch_pending = True
+        self._condition.notify()
+
+    def shutdown(self):
+        """
+        Stop the scheduler thread (busy jobs run to completion) and the
+        worker pool.
+        """
+        with self._condition:
+            self.is_shut_down = True
+            self._notify()
+
+        if self.is_alive() and current_thread() is not self:
+            self.join()
+
+        if self.worker_pool is not None:
+            self.worker_pool.shutdown()
+
+        if self.result_cache is not None:
+            self.result_cache.flush()
+
+    def add_agent(self, agent):
+        with self._condition:
+            self.agents.append(agent)
+            self._notify()
+
+    def remove_agent(self, agent):
+        """
+        Remove a disconnected agent, its busy jobs are queued again once
+        they noticed the loss of their worker.
+        """
+        with self._condition:
+            if agent in self.agents:
+                self.agents.remove(agent)
+
+    def get_hosts(self):
+        """
+        Capacity of the local machine and the remote agents, as dictionaries
+        with the `agent` (None for the local machine), its `cpus`, the
+        `free_cpus` and the `free_memory`.
+        """
+        used_cpus = set()
+        for job in self.busy_jobs:
+            used_cpus.update(job.cpus or tuple())
+
+        hosts = list()
+        capacities = [(None, self.cpu_ids[:self.available_kernels],
+                       self.max_memory)]
+        capacities += [(agent, agent.cpu_ids, agent.memory)
+                       for agent in self.agents]
+        for agent, cpus, memory in capacities:
+            busy_jobs = [job for job in self.busy_jobs if job.agent is agent]
+            hosts.append(dict(
+                agent=agent, cpus=cpus,
+                free_cpus=[cpu for cpu in cpus if cpu not in used_cpus],
+                free_memory=memory - sum(job.memory for job in busy_jobs),
+                idle=not busy_jobs))
+
+        return hosts
+
+    def get_free_cpus(self):
+        return [cpu for host in self.get_hosts() for cpu in host["free_cpus"]]
+
+    def get_free_memory(self):
+        return self.get_hosts()[0]["free_memory"]
+
+    def can_dispatch(self):
+        return (self.is_running and len(self.queue_jobs) > 0
+                and len(self.get_free_cpus()) > 0)
 
     def run(self):
         while True:
-            if self.is_running and len(self.queue_jobs) > 0:
-                self.process_queue()
+            with self._condition:
+                while not (self.is_shut_down or
+                           self._dispatch_pending and self.can_dispatch()):
+                    if self.has_limits():
+                        self._condition.wait(self.limit_check_interval)
+                        self.enforce_limits()
+                    else:
+                        self._condition.wait()
 
-            time.sleep(.2)
+                if self.is_shut_down:
+                    return
 
-    def process_queue(self):
-        # if len(os.sched_getaffinity(0)) > 0:
-        if len(self.busy_jobs) < self.available_kernels:
-            job = self.queue_jobs.pop(0)
-            self.sync_queue()
+                self._dispatch_pending = False
+
+            self.process_queue()
 
+    def has_limits(self):
+        return any(job.wall_time_limit is not None
+                   or job.cpu_time_limit is not None
+                   for job in self.busy_jobs)
+
+    def enforce_limits(self):
+        for job in self.busy_jobs:
+            reason = job.exceeded_limit()
+            if reason is not None:
+                job.cancel(reason)
+
+    def process_queue(self):
+        started_jobs = list()
+        with self._condition:
+            hosts = self.get_hosts()
+
+            def select_host(job):
+                for host in hosts:
+                    if not host["cpus"]:
+                        continue
+
+                    # a job which exceeds the host runs alone
+                    if host["idle"]:
+                        return host
+
+                    n_cpus = min(job.n_cpus, len(host["cpus"]))
+                    if (n_cpus <= len(host["free_cpus"])
+                            and job.memory <= host["free_memory"]):
+                        return host
+
+                return None
+
+            def fits(job):
+                return select_host(job) is not None
+
+            while (self.is_running and len(self.queue_jobs) > 0
+                   and any(host["free_cpus"] for host in hosts)):
+                job = self.queue_jobs.pop_next(fits, self.packing_lookahead)
+                if job is None:
+                    break
+
+                host = select_host(job)
+                free_cpus = host["free_cpus"]
+                n_cpus = min(max(job.n_cpus, 1), len(free_cpus))
+                job.cpus, host["free_cpus"] = (free_cpus[:n_cpus],
+                                               free_cpus[n_cpus:])
+                host["free_memory"] -= job.memory
+                host["idle"] = False
+                job.agent = host["agent"]
+                # agents map the cpus to their own
+                job.pin_cpus = self.pin_cpus or job.agent is not None
+                job.worker_pool = self.worker_pool
+                if job.checkpoint_store is None:
+                    job.checkpoint_store = self.checkpoint_store
+                job.job_finished.connect(self.on_job_finished)
+                job.job_lost.connect(self.on_job_lost)
+                self.busy_jobs.append(job)
+                started_jobs.append(job)
+
+        if not started_jobs:
+            return
+
+        self.job_change(JobChange("moved", started_jobs, "queue", "busy"))
+        self.sync_queue()
+        for job in started_jobs:
+            if job.ident is not None:
+                # queued again after its worker was lost
+                job.join()
+                job.renew_thread()
             job.start()
+        self.sync_busy()
 
-            self.busy_jobs.append(job)
-            job.job_finished.observe(self.on_job_finished, names="value")
-            self.sync_busy()
+    def on_job_lost(self, job):
+        # connected again when the job is dispatched
+        job.job_finished.disconnect(self.on_job_finished)
+        with self._condition:
+            self.busy_jobs.remove(job)
+            job.cpus = None
+            job.agent = None
+            self.queue_jobs.append(job)
+            self._notify()
+
+        self.job_change(JobChange("moved", [job], "busy", "queue"))
+        self.sync_busy()
+        self.sync_queue()
 
-    def on_job_finished(self, change):
-        job_index = Signal.as_index(change)
-        index = None
-        for i, job in enumerate(self.busy_jobs):
-            if job.job_index == job_index:
-                index = i
+    def on_job_finished(self, job):
+        # before the job is done, hence queueing it again hits the cache
+        if (self.result_cache is not None and job.cache_key is not None
+                and job._completed):
+            self.result_cache.put(job.cache_key, job)
 
-        if index < 0 or index >= len(self.busy_jobs):
-            raise ValueError("Job is lost in busy queue.")
+        with self._condition:
+            if job not in self.busy_jobs:
+                raise ValueError("Job is lost in busy queue.")
+
+            self.busy_jobs.remove(job)
+            self.done_jobs.append(job)
+            self._notify()
+
+        self.job_change(JobChange("moved", [job], "busy", "done"))
+        self.sync_busy()
+        self.sync_done()
+
+
+def get_cpu_ids():
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+
+    return list(range(cpu_count()))
 
-        else:
-            self.done_jobs.append(self.busy_jobs.pop(index))
-            self.sync_busy()
-            self.sync_done()
+
+def get_physical_memory():
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+
+    except (AttributeError, ValueError, OSError):
+        return float("inf")
 
 
 class OutputWidgetHandler(logging.Handler):
-    def __init__(self, *args, **kwargs):
+    """
+    Keeps the last `max_lines` formatted log records, the older lines are
+    spilled to `log_file`, a temporary file by default, which is removed
+    on :py:meth:`close`. The output widget is created on first access of
+    :py:attr:`out` and is updated at most every `flush_interval` seconds,
+    with all new lines at once.
+    """
+    def __init__(self, *args, max_lines=1000, flush_interval=.25,
+                 log_file=None, **kwargs):
         super().__init__(*args, **kwargs)
-        self.out = iw.Output()
+        self._lines = deque(maxlen=max_lines)
+        self.flush_interval = flush_interval
+        self.log_file = log_file
+        # the temporary log file is removed on close
+        self._own_log_file = False
+        self.n_spilled = 0
+        self._spill_buffer = list()
+        self._out = None
+        self._timer = None
+        self._last_flush = 0.
 
-    def emit(self, record):
-        formatted_record = self.format(record)
-        new_output = {
-            'name': 'stdout',
-            'output_type': 'stream',
-            'text': formatted_record+'\n'
-        }
-        self.out.outputs = (new_output, ) + self.out.outputs
+    def get_lines(self):
+        with self.lock:
+            return list(self._lines)
 
+    def set_lines(self, lines):
+        with self.lock:
+            self._lines.clear()
+            self.extend_lines(lines)
 
-class Signal(iw.ValueWidget):
-    def __init__(self):
-        super().__init__(value=0)
+    lines = property(get_lines, set_lines)
 
-    def __call__(self, index=None):
-        if index is None:
-            self.value += 1
+    @property
+    def max_lines(self):
+        return self._lines.maxlen
 
-        else:
-            self.value -= index + 1
+    def get_out(self):
+        if self._out is None:
+            import ipywidgets as iw
+
+            self._out = iw.Output()
+            self.flush()
+
+        return self._out
+
+    out = property(get_out)
 
     @staticmethod
-    def as_index(change):
-        value = change["new"] - change["old"]
-        if value < 0:
-            return abs(value) - 1
+    def as_output(line):
+        return {
+            'name': 'stdout',
+            'output_type': 'stream',
+            'text': line+'\n'
+        }
+
+    def extend_lines(self, lines):
+        for line in lines:
+            if len(self._lines) == self._lines.maxlen:
+                self._spill_buffer.append(self._lines.popleft())
+            self._lines.append(line)
+
+        if len(self._spill_buffer) >= 100:
+            self.spill()
+
+    def spill(self):
+        if not self._spill_buffer:
+            return
+
+        if self.log_file is None:
+            import tempfile
+
+            handle, self.log_file = tempfile.mkstemp(
+                prefix="juts-log-", suffix=".txt")
+            os.close(handle)
+            self._own_log_file = True
+
+        # n_spilled counts the lines of the file, not the records
+        lines = split_records(self._spill_buffer)
+        with open(self.log_file, "a") as f:
+            f.write("\n".join(lines) + "\n")
+        self.n_spilled += len(lines)
+        self._spill_buffer = list()
+
+    def get_all_lines(self):
+        """
+        Return all lines, including the ones spilled to the log file. Unlike
+        :py:attr:`lines`, records of several lines are split.
+        """
+        with self.lock:
+            self.spill()
+            lines = list()
+            if self.n_spilled:
+                with open(self.log_file, "r") as f:
+                    lines = f.read().splitlines()[:self.n_spilled]
+
+            return lines + split_records(self._lines)
+
+    def load(self, filename):
+        """
+        Show the tail of the log in `filename`, which serves as log file
+        for the older lines.
+        """
+        with open(filename, "r") as f:
+            lines = f.read().splitlines()
+
+        with self.lock:
+            self.remove_log_file()
+            self.log_file = filename
+            self.n_spilled = max(len(lines) - self.max_lines, 0)
+            self._spill_buffer = list()
+            self._lines.clear()
+            self._lines.extend(lines[self.n_spilled:])
+
+    def emit(self, record):
+        formatted_record = self.format(record)
+        self.extend_lines([formatted_record])
+        if self._out is not None and self._timer is None:
+            delay = self._last_flush + self.flush_interval - time.monotonic()
+            self._timer = Timer(max(delay, 0), self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        with self.lock:
+            self._timer = None
+            self._last_flush = time.monotonic()
+            self.spill()
+            text = "\n".join(reversed(self._lines))
+
+        # the newest line on top
+        if self._out is not None:
+            self._out.outputs = (self.as_output(text), ) if text else tuple()
+
+    def remove_log_file(self):
+        if self._own_log_file:
+            try:
+                os.remove(self.log_file)
+
+            except FileNotFoundError:
+                pass
+            self.log_file = None
+            self._own_log_file = False
+            self.n_spilled = 0
+
+    def close(self):
+        with self.lock:
+            if self._timer is not None:
+                self._timer.cancel()
+        self.flush()
+        with self.lock:
+            self.remove_log_file()
+        super().close()
+
+
+def split_records(records):
+    return [line for record in records
+            for line in record.splitlines() or [""]]
+
+
+class JobChange:
+    """
+    Change of the job lists of a :py:class:`JobScheduler`, the lists are
+    named "queue", "busy" and "done". `jobs` were "inserted" into or
+    "removed" from the list `source`, or "moved" from `source` to `target`.
+    Jobs which are moved within the queue were reordered.
+    """
+    def __init__(self, kind, jobs, source, target=None):
+        self.kind = kind
+        self.jobs = jobs
+        self.source = source
+        self.target = target
+
+    def __repr__(self):
+        lists = self.source if self.target is None else "{} -> {}".format(
+            self.source, self.target)
+
+        return "JobChange({}, {} jobs, {})".format(self.kind, len(self.jobs),
+                                                   lists)
+
+
+class Hook:
+    """
+    Plain list of callbacks, which are called with the arguments the hook
+    is called with, in the calling thread.
+    """
+    def __init__(self):
+        self.count = 0
+        self._callbacks = list()
+        self._lock = Lock()
+
+    def __call__(self, *args, **kwargs):
+        with self._lock:
+            self.count += 1
+            callbacks = list(self._callbacks)
+
+        for callback in callbacks:
+            callback(*args, **kwargs)
+
+    def connect(self, callback):
+        with self._lock:
+            if callback not in self._callbacks:
+                self._callbacks.append(callback)
+
+    def disconnect(self, callback):
+        with self._lock:
+            self._callbacks.remove(callback)
 
 
 def block_signal(meth):
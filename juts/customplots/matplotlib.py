@@ -15,13 +15,12 @@ except AttributeError:
     raise AttributeError(
         "Maybe '%matplotlib widget' magic is missing in the notebook!")
 
-plt.ioff()
-plt.clf()
-
 
 class MplPlot(Plot, metaclass=ABCMeta):
     def __init__(self, jobs, figsize=(4, 4), update_cycle=0.1, timeout=2,
                  jobs_valid=True):
+        # figures are shown through their canvas widget only
+        plt.ioff()
         self.fig = plt.figure(figsize=figsize)
         widget = self.fig.canvas
 
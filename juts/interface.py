@@ -1,16 +1,23 @@
 from .container import JobScheduler, Job, Configuration, \
     load_configs_from_file, block_signal, on_unblocked_signal, \
     dump_configurations, get_filename, \
-    load_configs_from_file_upload, Signal
-from .widgets import SchedulerForm, VisualizerForm, UserInterfaceForm
+    load_configs_from_file_upload
+from .sweep import sweep_jobs
+from .widgets import SchedulerForm, VisualizerForm, UserInterfaceForm, \
+    Signal
 from IPython.display import FileLink
+from collections import OrderedDict
+from threading import Lock, Timer
+from bisect import bisect_left
 import ipywidgets as iw
 import warnings
 
 
 class SchedulerInterface(SchedulerForm):
-    def __init__(self):
+    def __init__(self, job_scheduler=None):
         super().__init__()
+        self._block_signal = False
+        self._result_store = None
 
         self.load_configs_bt.observe(self.on_load_configs, names="value")
         self.save_configs_bt.on_click(self.on_save_configs)
@@ -32,10 +39,11 @@ class SchedulerInterface(SchedulerForm):
         self.config_list.select.observe(self.on_config_change_options, names="options")
         self.func_list.select.observe(self.on_func_change, names="index")
 
-        self.queue_list.select.observe(self.on_queue_change, names="index")
-        self.busy_list.select.observe(self.on_busy_change, names="index")
-        self.result_list.select.observe(self.on_result_change, names="index")
-        self.result_list.select.observe(self.on_result_change_options, names="options")
+        self.queue_list.observe(self.on_queue_change, names="index")
+        self.busy_list.observe(self.on_busy_change, names="index")
+        self.result_list.observe(self.on_result_change, names="index")
+        self.result_list.observe(self.on_result_change_options,
+                                 names="n_items")
 
         # only config view
         self.config_job_view.queue_bt.on_click(self.on_queue_bt)
@@ -51,11 +59,18 @@ class SchedulerInterface(SchedulerForm):
         # only job view
         self.job_view.save_result_bt.on_click(self.on_save_result_bt)
 
-        self.job_scheduler = JobScheduler()
-        self.job_scheduler.start()
-        self.job_scheduler.sync_queue.observe(self.on_js_sync_queue, names="value")
-        self.job_scheduler.sync_busy.observe(self.on_js_sync_busy, names="value")
-        self.job_scheduler.sync_done.observe(self.on_js_sync_done, names="value")
+        # bind to a (headless) scheduler, which may already be running
+        if job_scheduler is None:
+            job_scheduler = JobScheduler()
+        self.job_scheduler = job_scheduler
+        if not self.job_scheduler.is_alive():
+            self.job_scheduler.start()
+        # the changes of the job lists are applied every `sync_interval`
+        self.sync_interval = .1
+        self._changes = list()
+        self._changes_lock = Lock()
+        self._sync_timer = None
+        self.job_scheduler.job_change.connect(self.on_js_change)
         self.job_scheduler_lists = [self.job_scheduler.queue_jobs,
                                     self.job_scheduler.busy_jobs,
                                     self.job_scheduler.done_jobs]
@@ -64,9 +79,12 @@ class SchedulerInterface(SchedulerForm):
 
         self.n_kernels.max = self.job_scheduler.max_kernels
         self.n_kernels.min = 1
-        self.n_kernels.value = self.job_scheduler.max_kernels
+        self.n_kernels.value = self.job_scheduler.available_kernels
+        self.play_queue_bt.value = self.job_scheduler.is_running
 
-        self._block_signal = False
+        self.on_js_sync_queue()
+        self.on_js_sync_busy()
+        self.on_js_sync_done()
 
     def on_load_configs(self, change):
         configs = load_configs_from_file_upload(self.load_configs_bt)
@@ -84,8 +102,42 @@ class SchedulerInterface(SchedulerForm):
         fl = FileLink(fn)
         self.download_view.add_file_link(fl)
 
+    def get_result_store(self):
+        if self._result_store is None:
+            from .store import ResultStore
+            self._result_store = ResultStore()
+
+        return self._result_store
+
+    def set_result_store(self, store):
+        self._result_store = store
+
+    result_store = property(get_result_store, set_result_store)
+
     def on_save_results(self, change):
-        pass
+        for job in list(self.job_scheduler.done_jobs):
+            self.save_result(job)
+
+    def save_result(self, job):
+        if job.directory is not None:
+            return
+
+        job.directory = self.result_store.save(job)
+        fl = FileLink(job.directory)
+        self.download_view.add_file_link(fl)
+
+    def load_results(self):
+        """
+        Append the jobs of :py:attr:`result_store` which are not listed yet
+        to the results.
+        """
+        done_jobs = self.job_scheduler.done_jobs
+        listed = {job.directory for job in done_jobs}
+        for job in self.result_store.load_all():
+            if job.directory not in listed:
+                done_jobs.append(job)
+
+        self.on_js_sync_done()
 
     def on_discard_func(self, change):
         self.func_list.pop_item()
@@ -111,12 +163,21 @@ class SchedulerInterface(SchedulerForm):
 
     def on_discard_job_bt(self, change):
         for i, lst in enumerate(self.job_lists):
-            if lst.select.index is not None:
-                self.job_scheduler_lists[i].pop(lst.select.index)
-                sync_handl = [self.on_js_sync_queue,
-                              self.on_js_sync_busy,
-                              self.on_js_sync_done][i]
-                sync_handl(None)
+            if lst.index is None:
+                continue
+
+            job = lst.get_selected()
+            if i == 1:
+                # moved to the results once its worker is terminated
+                self.job_scheduler.cancel_job(job)
+                continue
+
+            # the job lists are patched from the change of the scheduler
+            if i == 0:
+                self.job_scheduler.remove_queue_job(job)
+            else:
+                self.job_scheduler.remove_done_job(job)
+            job.discard()
 
     @on_unblocked_signal
     def on_func_change(self, change):
@@ -154,7 +215,7 @@ class SchedulerInterface(SchedulerForm):
         self.view_new_job(2, change["new"])
 
     def on_result_change_options(self, change):
-        self.save_results_bt.disabled = len(change["new"]) == 0
+        self.save_results_bt.disabled = change["new"] == 0
 
     def view_new_job(self, list_index, item_index):
         if item_index is None:
@@ -162,7 +223,7 @@ class SchedulerInterface(SchedulerForm):
 
         for i, lst in enumerate(self.job_lists):
             if i != list_index:
-                lst.select.index = None
+                lst.index = None
 
         try:
             new_job = self.job_lists[list_index].item_list[item_index]
@@ -177,24 +238,37 @@ class SchedulerInterface(SchedulerForm):
         self.add_config(self.job_view.get_config())
 
     def get_visible_job_names(self):
-        return list(self.queue_list.select.options) + \
-            list(self.busy_list.select.options) + \
-            list(self.result_list.select.options)
+        return set().union(*[lst.names for lst in self.job_lists])
 
-    @block_signal
-    def on_queue_bt(self, change):
-        assert self.config_job_view.source_list == "config"
-        job = self.config_job_view.get_job()
-        visible_jobs = self.get_visible_job_names()
+    @staticmethod
+    def make_name_unique(job, visible_jobs):
         if job.name in visible_jobs:
             i = 1
             while f"{job.name}_{i}" in visible_jobs:
                 i += 1
             job.name = f"{job.name}_{i}"
+
+    @block_signal
+    def on_queue_bt(self, change):
+        assert self.config_job_view.source_list == "config"
+        job = self.config_job_view.get_job()
+        visible_jobs = self.get_visible_job_names()
+        if job.config.sweep is not None:
+            self.queue_sweep(job, visible_jobs)
+            return
+
+        self.make_name_unique(job, visible_jobs)
         self.job_scheduler.append_queue_job(job)
         self.queued_job = job
         self.job_queued()
 
+    def queue_sweep(self, job, visible_jobs):
+        jobs = list(sweep_jobs(job.func, job.config,
+                               **job.get_scheduling_kwargs()))
+        for sweep_job in jobs:
+            self.make_name_unique(sweep_job, visible_jobs)
+        self.job_scheduler.extend_queue_jobs(jobs)
+
     def on_cjv_save_config_bt(self, change):
         self.on_save_config_bt(self.config_job_view.get_config())
 
@@ -207,27 +281,117 @@ class SchedulerInterface(SchedulerForm):
 
     def on_save_result_bt(self, change):
         if not self.job_view.results_empty:
-            pass
+            self.save_result(self.job_view.job)
+
+    def on_js_change(self, change):
+        with self._changes_lock:
+            self._changes.append(change)
+            if self._sync_timer is not None:
+                return
+
+            self._sync_timer = Timer(self.sync_interval, self.apply_changes)
+            self._sync_timer.daemon = True
+            self._sync_timer.start()
 
     @block_signal
-    def on_js_sync_queue(self, change):
-        self.queue_list.sync_items(list(self.job_scheduler.queue_jobs))
+    def apply_changes(self):
+        """
+        Patch the job lists with the changes of the scheduler since the last
+        call. The job view is only updated if the selected job changed its
+        list, which then selects it.
+        """
+        with self._changes_lock:
+            changes, self._changes = self._changes, list()
+            self._sync_timer = None
+
+        names = dict(zip(["queue", "busy", "done"], self.job_lists))
+        removed = {name: set() for name in names}
+        inserted = {name: OrderedDict() for name in names}
+        moved = dict()
+        for change in changes:
+            if change.kind in ("removed", "moved"):
+                for job in change.jobs:
+                    if inserted[change.source].pop(id(job), None) is None:
+                        removed[change.source].add(id(job))
+
+            if change.kind == "inserted":
+                target = change.source
+            elif change.kind == "moved":
+                target = change.target
+            else:
+                continue
+
+            for job in change.jobs:
+                inserted[target][id(job)] = job
+                moved[id(job)] = target
+
+        selected = None
+        for lst in self.job_lists:
+            if lst.index is not None:
+                selected = lst.get_selected()
+
+        for name, lst in names.items():
+            if name == "queue":
+                insertions = self.get_queue_insertions(
+                    removed[name], list(inserted[name].values()))
+            else:
+                insertions = [(None, job) for job in inserted[name].values()]
+            if removed[name] or insertions:
+                lst.patch(removed[name], insertions)
+
+        if selected is None or id(selected) not in moved:
+            return
+
+        target = names[moved[id(selected)]]
+        for lst in self.job_lists:
+            if lst is not target:
+                lst.index = None
+        for i, job in enumerate(target.item_list):
+            if job is selected:
+                target.index = i
         self.update_job_view()
 
+    def get_queue_insertions(self, removed, jobs):
+        """
+        Return the positions of the `jobs` in the queue list, which follows
+        the dispatch order of the scheduler.
+        """
+        if not jobs:
+            return list()
+
+        queue_jobs = self.job_scheduler.get_queue_jobs()
+        order = {id(job): i for i, job in enumerate(queue_jobs)}
+        # jobs which already left the queue were dispatched first
+        listed = [order.get(id(job), -1) for job in self.queue_list.item_list
+                  if id(job) not in removed]
+        insertions = list()
+        for i, job in sorted([(order[id(job)], job) for job in jobs
+                              if id(job) in order], key=lambda it: it[0]):
+            position = bisect_left(listed, i)
+            listed.insert(position, i)
+            insertions.append((position, job))
+
+        return insertions
+
     @block_signal
-    def on_js_sync_busy(self, change):
+    def on_js_sync_queue(self, change=None):
+        self.queue_list.sync_items(self.job_scheduler.get_queue_jobs())
+        self.update_job_view()
+
+    @block_signal
+    def on_js_sync_busy(self, change=None):
         self.busy_list.sync_items(list(self.job_scheduler.busy_jobs))
         self.update_job_view()
 
     @block_signal
-    def on_js_sync_done(self, change):
+    def on_js_sync_done(self, change=None):
         self.result_list.sync_items(list(self.job_scheduler.done_jobs))
         self.update_job_view()
 
     def update_job_view(self):
         for i, lst in enumerate(self.job_lists):
-            if lst.select.index is not None:
-                self.job_view.update_view(lst.item_list[lst.select.index],
+            if lst.index is not None:
+                self.job_view.update_view(lst.get_selected(),
                                           self.job_list_labels[i])
                 return
 
@@ -281,6 +445,8 @@ class VisualizerInterface(VisualizerForm):
         pwidget = self.widget_list.item_list[self.widget_list.select.index]
         plot = pwidget(jobs)
         if plot.jobs_valid:
+            # rendered once shown in the plot view
+            plot.set_visible(False)
             plot.start()
             self.plot_list.append_items([plot])
         else:
@@ -288,8 +454,8 @@ class VisualizerInterface(VisualizerForm):
 
 
 class UserInterface(UserInterfaceForm):
-    def __init__(self):
-        scheduler = SchedulerInterface()
+    def __init__(self, job_scheduler=None):
+        scheduler = SchedulerInterface(job_scheduler)
         visualizer = VisualizerInterface(scheduler.play_queue_bt)
         super().__init__(scheduler, visualizer)
 
@@ -300,15 +466,13 @@ class UserInterface(UserInterfaceForm):
     def on_add_to_visu(self, change):
         job_list = None
         for lst in self.scheduler.job_lists:
-            if lst.select.index is not None:
+            if lst.index is not None:
                 job_list = lst
 
         if job_list is None:
             return
-        if job_list.select.index is None:
-            return
 
-        self.add_to_visu(job_list.item_list[job_list.select.index])
+        self.add_to_visu(job_list.get_selected())
 
     def add_to_visu(self, job):
         if job.name in self.visualizer.job_list.select.options:
@@ -3,13 +3,275 @@ import warnings
 from .widgets import Plot, ReplayPanel
 from collections import OrderedDict
 from numbers import Number
+from bisect import bisect_left, bisect_right
 import ipywidgets as iw
 import bqplot as bq
 import numpy as np
 
 
+class SeriesMatrix:
+    """
+    NaN padded matrix of the series of several live jobs, one row per job.
+    The columns are preallocated and grow geometrically; an update copies
+    only the samples which were appended since the last one.
+    """
+    min_capacity = 64
+
+    def __init__(self, n_rows):
+        self._data = np.full((n_rows, SeriesMatrix.min_capacity), np.nan)
+        self.lengths = [0] * n_rows
+        self.changed = False
+
+    def update(self, row, series):
+        length = self.lengths[row]
+        if len(series) < length:
+            # the result was reset, e.g. a requeued job
+            self.reset_row(row)
+            length = 0
+
+        if len(series) == length:
+            return
+
+        self.reserve(len(series))
+        self._data[row, length:len(series)] = series[length:]
+        self.lengths[row] = len(series)
+        self.changed = True
+
+    def reset_row(self, row):
+        """
+        Drop the samples of `row`, e.g. if the live result of the job was
+        replaced by its final result.
+        """
+        self._data[row] = np.nan
+        self.lengths[row] = 0
+        self.changed = True
+
+    def reserve(self, size):
+        capacity = self._data.shape[1]
+        if size <= capacity:
+            return
+
+        while capacity < size:
+            capacity *= 2
+
+        data = np.full((len(self._data), capacity), np.nan)
+        data[:, :self._data.shape[1]] = self._data
+        self._data = data
+
+    def get_row(self, row):
+        return self._data[row, :self.lengths[row]]
+
+    def get_view(self, n_points=0):
+        """
+        Return the filled part of the matrix, only the last `n_points`
+        samples of every row if `n_points` is not 0.
+        """
+        self.changed = False
+        n_columns = max(self.lengths, default=0)
+        if not n_points or n_points >= n_columns:
+            # a copy, the rendered values must not change with the buffer
+            return np.array(self._data[:, :n_columns])
+
+        view = np.full((len(self._data), n_points), np.nan)
+        for row, length in enumerate(self.lengths):
+            tail = self._data[row, max(length - n_points, 0):length]
+            view[row, :len(tail)] = tail
+
+        return view
+
+
+def pad_rows(rows):
+    """
+    Return the NaN padded matrix of the 1d arrays `rows`.
+    """
+    matrix = np.full((len(rows), max(map(len, rows), default=0)), np.nan)
+    for row, values in enumerate(rows):
+        matrix[row, :len(values)] = values
+
+    return matrix
+
+
+def search_sorted(x, value, side="left"):
+    """
+    :py:func:`numpy.searchsorted` which only reads the samples it compares
+    if `x` is not a numpy array, e.g. a :py:class:`StoredArray`.
+    """
+    if isinstance(x, np.ndarray):
+        return int(np.searchsorted(x, value, side))
+
+    if side == "left":
+        return bisect_left(x, value)
+
+    return bisect_right(x, value)
+
+
+def bucket_extrema(y, start, size, n_buckets):
+    """
+    Return the indices of the minimum and the maximum of `n_buckets`
+    buckets of `size` samples of `y`, beginning at `start`, as rows.
+    """
+    buckets = y[start:start + n_buckets * size].reshape(n_buckets, size)
+    offsets = start + size * np.arange(n_buckets)
+
+    return np.stack([offsets + np.argmin(buckets, axis=1),
+                     offsets + np.argmax(buckets, axis=1)], axis=1)
+
+
+def minmax_indices(y, n_buckets):
+    """
+    Return the sorted indices of the minimum and the maximum of each of
+    `n_buckets` equally long buckets of `y`.
+    """
+    if len(y) <= 2 * n_buckets:
+        return np.arange(len(y))
+
+    size = int(np.ceil(len(y) / n_buckets))
+    n_full = len(y) // size
+    indices = [bucket_extrema(y, 0, size, n_full).ravel()]
+    if n_full * size < len(y):
+        indices.append(bucket_extrema(y, n_full * size,
+                                      len(y) - n_full * size, 1).ravel())
+
+    return np.unique(np.concatenate(indices))
+
+
+def chunked_minmax_indices(y, n_buckets, lo=0, hi=None,
+                           chunk_size=2 ** 20):
+    """
+    :py:func:`minmax_indices` of `y[lo:hi]`, as indices of `y`. The samples
+    are read in chunks of about `chunk_size`, hence a memory-mapped or
+    stored series is never loaded at once.
+    """
+    if hi is None:
+        hi = len(y)
+    if hi - lo <= 2 * n_buckets:
+        return np.arange(lo, hi)
+
+    size = int(np.ceil((hi - lo) / n_buckets))
+    step = max(chunk_size // size, 1) * size
+    indices = list()
+    for start in range(lo, hi, step):
+        chunk = np.asarray(y[start:min(start + step, hi)])
+        n_full = len(chunk) // size
+        indices.append(start + bucket_extrema(chunk, 0, size, n_full).ravel())
+        if n_full * size < len(chunk):
+            indices.append(start + bucket_extrema(
+                chunk, n_full * size, len(chunk) - n_full * size, 1).ravel())
+
+    return np.unique(np.concatenate(indices))
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Return the indices of `n_out` samples selected by the
+    largest-triangle-three-buckets algorithm: the first and the last sample
+    and, per bucket, the sample which spans the largest triangle with the
+    previously selected one and the mean of the next bucket.
+    """
+    n = len(x)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    selected = np.empty(n_out, int)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_x = x[hi:edges[i + 2]].mean()
+            next_y = y[hi:edges[i + 2]].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+
+        area = np.abs((x[a] - next_x) * (y[lo:hi] - y[a])
+                      - (x[a] - x[lo:hi]) * (next_y - y[a]))
+        a = lo + np.argmax(area)
+        selected[i + 1] = a
+
+    return selected
+
+
+class MinMaxDecimator:
+    """
+    Keeps the indices of the minimum and the maximum of at most
+    `n_buckets` buckets of a growing series. New samples are bucketed as
+    they arrive; if there are too many buckets, neighbouring buckets are
+    merged and the bucket size doubles, hence an update costs only the new
+    samples.
+    """
+    def __init__(self, n_buckets):
+        self.n_buckets = n_buckets
+        self.reset()
+
+    def reset(self):
+        self.bucket_size = 1
+        self.extrema = np.empty((0, 2), int)
+        self.length = 0
+
+    def update(self, y):
+        if len(y) < self.length:
+            self.reset()
+
+        if self.length == 0:
+            while len(y) > self.bucket_size * self.n_buckets:
+                self.bucket_size *= 2
+
+        while True:
+            n_buckets = (len(y) - self.length) // self.bucket_size
+            if n_buckets:
+                extrema = bucket_extrema(y, self.length, self.bucket_size,
+                                         n_buckets)
+                self.extrema = np.concatenate([self.extrema, extrema])
+                self.length += n_buckets * self.bucket_size
+
+            if len(self.extrema) <= self.n_buckets:
+                return
+
+            self.merge(y)
+
+    def merge(self, y):
+        if len(self.extrema) % 2:
+            self.extrema = self.extrema[:-1]
+            self.length -= self.bucket_size
+
+        pairs = self.extrema.reshape(-1, 2, 2)
+        rows = np.arange(len(pairs))
+        minima = pairs[rows, np.argmin(y[pairs[:, :, 0]], axis=1), 0]
+        maxima = pairs[rows, np.argmax(y[pairs[:, :, 1]], axis=1), 1]
+        self.extrema = np.stack([minima, maxima], axis=1)
+        self.bucket_size *= 2
+
+    def get_indices(self, y):
+        indices = [self.extrema.ravel()]
+        if self.length < len(y):
+            indices.append(bucket_extrema(y, self.length,
+                                          len(y) - self.length, 1).ravel())
+
+        return np.unique(np.concatenate(indices))
+
+
 class TimeSeriesPlot(Plot):
-    def __init__(self, jobs, plot_layout="tab"):
+    """
+    Plots the time series of the results of `jobs`, one figure per result
+    key.
+
+    Args:
+        jobs: The jobs to plot.
+        plot_layout: "tab" or "vbox".
+        decimation: "minmax", "lttb" or None to send all samples. The
+            series are reduced to about two samples per pixel of the visible
+            time range, hence a zoomed region shows the full resolution.
+        n_pixels: Width of the figures in pixels.
+    """
+    def __init__(self, jobs, plot_layout="tab", decimation="minmax",
+                 n_pixels=800):
+        if decimation not in (None, "minmax", "lttb"):
+            raise ValueError("Unknown decimation {}".format(decimation))
+        self.decimation = decimation
+        self.n_pixels = n_pixels
+
         self.n_points = iw.BoundedIntText(
             value=0,
             min=0,
@@ -31,48 +293,160 @@ class TimeSeriesPlot(Plot):
         super().__init__(jobs, widget)
 
         self.indices = dict()
+        self.schema_versions = None
+        # the jobs whose rows are refilled on the next update
+        self.reset_jobs = set()
         self.figures = dict()
+        self.series = dict()
+        self.decimators = dict()
+        # decimated samples of the finished jobs, by result name and row
+        self.final_indices = dict()
+        self.x_scales = dict()
+        self.redraw = True
         self.jobs = jobs
         self.update_plot()
 
     def on_n_points(self, change):
+        self.redraw = True
+        if all([not job.is_alive() for job in self.jobs]):
+            self.update_plot()
+
+    def on_zoom(self, change):
+        if self.decimation is None:
+            return
+
+        self.redraw = True
         if all([not job.is_alive() for job in self.jobs]):
             self.update_plot()
+        else:
+            self.request_update()
 
     def update_plot(self, *args, **kwargs):
         if self.result_structure_changed():
             self.update_figures()
+        self.reset_rows()
 
+        redraw, self.redraw = self.redraw, False
         for res_name, job_dict in self.indices.items():
-            x = list()
-            y = list()
-            for index in job_dict.values():
-                if "time" not in self.jobs[index].result:
+            xx, yy = self.series[res_name]
+            rows = list()
+            for row, index in enumerate(job_dict.values()):
+                job = self.jobs[index]
+                result = job.result
+                if "time" not in result:
+                    rows.append(None)
                     continue
 
-                x.append(list(
-                    self.jobs[index].result["time"][-self.n_points.value:]))
-                y.append(list(
-                    self.jobs[index].result[res_name][-self.n_points.value:]))
-
-            if any([len(xi) != len(yi) for xi, yi in zip(x, y)]):
-                raise ValueError("X (time) and Y data have different shapes.")
-
-            if not(len(x) > 0 and any([len(xi) > 1 for xi in x])):
-                return
-
-            xx = np.empty((len(x), max([len(xi) for xi in x])), float)
-            xx[:] = np.nan
-            yy = np.array(xx)
-            for i, xi in enumerate(x):
-                xx[i, :len(xi)] = xi
-            for i, yi in enumerate(y):
-                yy[i, :len(yi)] = yi
-
-            self.figures[res_name].marks[0].x = xx
-            self.figures[res_name].marks[0].y = yy
+                x = result["time"]
+                y = result[res_name]
+                if len(x) != len(y):
+                    raise ValueError(
+                        "X (time) and Y data have different shapes.")
+
+                if job.job_is_alive:
+                    # the live samples are copied as they arrive, the
+                    # results of finished jobs are read where they are
+                    xx.update(row, x)
+                    yy.update(row, y)
+                    x, y = xx.get_row(row), yy.get_row(row)
+                rows.append((x, y, job.job_is_alive))
+
+            if not (redraw or xx.changed or yy.changed):
+                continue
+            xx.changed = yy.changed = False
+
+            if not any(row is not None and len(row[0]) > 1 for row in rows):
+                continue
+
+            samples = [(np.empty(0), np.empty(0)) if values is None
+                       else self.get_samples(res_name, row, *values)
+                       for row, values in enumerate(rows)]
+            self.figures[res_name].marks[0].x = pad_rows(
+                [x for x, y in samples])
+            self.figures[res_name].marks[0].y = pad_rows(
+                [y for x, y in samples])
+
+    def get_visible_range(self, res_name, x):
+        # the time is sorted, one more sample on each side continues the
+        # lines to the edges
+        lo, hi = 0, len(x)
+        if self.n_points.value:
+            lo = max(hi - self.n_points.value, 0)
+        if self.decimation is None:
+            return lo, hi
+
+        scale = self.x_scales[res_name]
+        if scale.min is not None:
+            lo = max(lo, search_sorted(x, scale.min, "left") - 1)
+        if scale.max is not None:
+            hi = min(hi, search_sorted(x, scale.max, "right") + 1)
+
+        return lo, hi
+
+    def get_samples(self, res_name, row, x, y, alive):
+        """
+        Return the samples of `row` to render, the visible samples
+        decimated to the width of the figure.
+        """
+        # returned lists, the stored results are read where they are
+        if not hasattr(x, "shape"):
+            x = np.asarray(x)
+        if not hasattr(y, "shape"):
+            y = np.asarray(y)
+
+        lo, hi = self.get_visible_range(res_name, x)
+        if self.decimation is None:
+            return x[lo:hi], y[lo:hi]
+
+        decimator = self.decimators[res_name][row]
+        if lo == 0 and hi == len(x):
+            if alive:
+                decimator.update(y)
+                indices = decimator.get_indices(y)
+            else:
+                key = (res_name, row)
+                if key not in self.final_indices:
+                    self.final_indices[key] = chunked_minmax_indices(
+                        y, decimator.n_buckets)
+                indices = self.final_indices[key]
+        else:
+            indices = chunked_minmax_indices(y, decimator.n_buckets, lo, hi)
+
+        x, y = np.asarray(x[indices]), np.asarray(y[indices])
+        if self.decimation == "lttb":
+            selected = lttb_indices(x, y, 2 * self.n_pixels)
+            x, y = x[selected], y[selected]
+
+        return x, y
+
+    def reset_rows(self):
+        """
+        Refill the rows of the jobs whose schema changed, since the samples
+        already rendered may have changed, e.g. if a finished job replaced
+        its live result by the returned one.
+        """
+        reset_jobs, self.reset_jobs = self.reset_jobs, set()
+        for res_name, job_dict in self.indices.items():
+            xx, yy = self.series[res_name]
+            for row, index in enumerate(job_dict.values()):
+                if index in reset_jobs:
+                    xx.reset_row(row)
+                    yy.reset_row(row)
+                    self.decimators[res_name][row].reset()
+                    self.final_indices.pop((res_name, row), None)
+                    self.redraw = True
 
     def result_structure_changed(self):
+        # the results are only scanned if the schema of a job changed
+        schema_versions = [job.schema_version for job in self.jobs]
+        if schema_versions == self.schema_versions:
+            return False
+        previous = self.schema_versions or list()
+        self.reset_jobs.update(
+            i for i, version in enumerate(schema_versions)
+            if i >= len(previous) or version != previous[i])
+        self.schema_versions = schema_versions
+
         indices = OrderedDict()
         for i, job in enumerate(self.jobs):
             for res_name, res in job.result.items():
@@ -97,8 +471,23 @@ class TimeSeriesPlot(Plot):
     def update_figures(self):
         self.figures = OrderedDict()
         self.fig_wids = OrderedDict()
+        self.series = OrderedDict()
+        self.decimators = OrderedDict()
+        self.final_indices = dict()
+        self.x_scales = OrderedDict()
+        self.redraw = True
+        # lttb selects from twice as many min/max candidates
+        n_buckets = self.n_pixels
+        if self.decimation == "lttb":
+            n_buckets *= 2
         for res_name, job_dict in self.indices.items():
+            self.series[res_name] = (SeriesMatrix(len(job_dict)),
+                                     SeriesMatrix(len(job_dict)))
+            self.decimators[res_name] = [MinMaxDecimator(n_buckets)
+                                         for _ in job_dict]
             sc_x = bq.LinearScale()
+            sc_x.observe(self.on_zoom, names=["min", "max"])
+            self.x_scales[res_name] = sc_x
             sc_y = bq.LinearScale()
             line = bq.Lines(
                 scales={'x': sc_x, 'y': sc_y},
@@ -198,8 +587,10 @@ class TimeSeriesPlot(Plot):
 
 
 class TimeSeriesReplayPlot(TimeSeriesPlot):
-    def __init__(self, jobs, plot_layout="tab"):
-        super().__init__(jobs, plot_layout=plot_layout)
+    def __init__(self, jobs, plot_layout="tab", decimation="minmax",
+                 n_pixels=800):
+        super().__init__(jobs, plot_layout=plot_layout,
+                         decimation=decimation, n_pixels=n_pixels)
 
         self.replay_panel = ReplayPanel()
         self.replay_panel.time_slider.observe(
@@ -0,0 +1,352 @@
+"""
+Run jobs of a :py:class:`juts.JobScheduler` on other machines. An
+:py:class:`AgentServer` accepts :py:class:`WorkerAgent` connections, the
+cpus of every agent extend the capacity of the scheduler. Start an agent
+on a compute box with::
+
+    python -m juts.remote --host notebook-server --port 6000 --authkey KEY
+
+Functions and configurations are pickled (by value if cloudpickle is
+available), hence only connect agents of trusted machines, authenticated by
+a shared key.
+"""
+from .container import get_cpu_ids, get_physical_memory
+from .transport import SharedArray, JobReturn
+from .workers import ProcessWorker, dump_function
+from multiprocessing.connection import Listener, Client
+from multiprocessing import AuthenticationError
+from threading import Thread, Lock
+from itertools import count
+from queue import Queue, Empty
+import traceback
+import argparse
+import socket
+import pickle
+import os
+
+
+class RemoteWorker:
+    """
+    Worker of a job which runs on a :py:class:`RemoteAgent`. The messages
+    of the job function arrive in the local `process_queue`.
+    """
+    def __init__(self, agent, job_id):
+        self.agent = agent
+        self.job_id = job_id
+        self.process_queue = Queue()
+        self.lost = False
+        self.terminated = False
+
+    def submit(self, func, config, cpus=None, resume_state=None):
+        slots = None
+        if cpus is not None:
+            slots = [self.agent.cpu_ids.index(cpu) for cpu in cpus]
+        self.agent.send(("submit", self.job_id, dump_function(func), config,
+                         slots, resume_state))
+
+    def is_alive(self):
+        return not (self.lost or self.terminated)
+
+    def release(self):
+        self.agent.release(self)
+
+    def terminate(self, timeout=1.):
+        self.terminated = True
+        self.agent.send(("cancel", self.job_id))
+        self.release()
+
+    def cpu_time(self):
+        return None
+
+
+class RemoteAgent:
+    """
+    Connection to a :py:class:`WorkerAgent`, as seen by the scheduler. Its
+    cpus are named `(name, slot)`.
+    """
+    def __init__(self, server, connection, name, n_cpus, memory):
+        self.server = server
+        self.connection = connection
+        self.name = name
+        self.cpu_ids = [(name, slot) for slot in range(n_cpus)]
+        self.memory = memory
+        self.connected = True
+        self.workers = dict()
+        self._ids = count()
+        self._lock = Lock()
+        self._send_lock = Lock()
+        self.receiver = Thread(target=self.receive, daemon=True)
+
+    def __repr__(self):
+        return "RemoteAgent({}, {} cpus)".format(self.name, len(self.cpu_ids))
+
+    def start(self):
+        self.receiver.start()
+
+    def acquire(self):
+        with self._lock:
+            worker = RemoteWorker(self, next(self._ids))
+            self.workers[worker.job_id] = worker
+            worker.lost = not self.connected
+
+        return worker
+
+    def release(self, worker):
+        with self._lock:
+            self.workers.pop(worker.job_id, None)
+
+    def send(self, message):
+        try:
+            with self._send_lock:
+                self.connection.send(message)
+
+        except (OSError, EOFError, ValueError):
+            self.disconnect()
+
+    def receive(self):
+        while True:
+            try:
+                kind, job_id, batch = self.connection.recv()
+
+            except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+                break
+
+            with self._lock:
+                worker = self.workers.get(job_id)
+            if worker is None:
+                continue
+
+            for status in batch:
+                worker.process_queue.put(status)
+
+        self.disconnect()
+
+    def disconnect(self):
+        """
+        Mark all busy workers as lost, their jobs are queued again.
+        """
+        with self._lock:
+            if not self.connected:
+                return
+
+            self.connected = False
+            workers = list(self.workers.values())
+
+        for worker in workers:
+            worker.lost = True
+
+        try:
+            self.connection.close()
+
+        except OSError:
+            pass
+
+        self.server.on_agent_disconnected(self)
+
+    def close(self):
+        self.send(("close", None))
+        self.disconnect()
+
+
+class AgentServer:
+    """
+    Accepts :py:class:`WorkerAgent` connections on `address` and adds the
+    agents to `scheduler`.
+
+    Args:
+        scheduler: The :py:class:`juts.JobScheduler`.
+        address: (host, port) to listen on, port 0 picks a free one, see
+            `address` after the start.
+        authkey: Key the agents have to authenticate with.
+    """
+    def __init__(self, scheduler, authkey, address=("localhost", 0)):
+        self.scheduler = scheduler
+        if isinstance(authkey, str):
+            authkey = authkey.encode()
+        self.listener = Listener(address, authkey=authkey)
+        self.address = self.listener.address
+        self.agents = list()
+        self.is_closed = False
+        self._names = count()
+        self.acceptor = Thread(target=self.accept, daemon=True)
+        self.acceptor.start()
+
+    def accept(self):
+        while not self.is_closed:
+            try:
+                connection = self.listener.accept()
+                kind, info = connection.recv()
+
+            except (OSError, EOFError, AuthenticationError):
+                continue
+
+            name = "{}#{}".format(info["host"], next(self._names))
+            agent = RemoteAgent(self, connection, name, info["n_cpus"],
+                                info["memory"])
+            self.agents.append(agent)
+            self.scheduler.add_agent(agent)
+            agent.start()
+
+    def on_agent_disconnected(self, agent):
+        if agent in self.agents:
+            self.agents.remove(agent)
+        self.scheduler.remove_agent(agent)
+
+    def close(self):
+        self.is_closed = True
+        self.listener.close()
+        for agent in list(self.agents):
+            agent.close()
+
+
+class WorkerAgent:
+    """
+    Runs the jobs it receives from an :py:class:`AgentServer`, each in a
+    fresh process, and streams their messages back. Shared arrays are
+    copied into the messages, since the segments are local.
+
+    Args:
+        address: (host, port) of the server.
+        authkey: Key shared with the server.
+        n_cpus: Number of cpus to advertise, all available by default.
+            More than available oversubscribe the cpus.
+    """
+    def __init__(self, address, authkey, n_cpus=None):
+        self.address = tuple(address)
+        if isinstance(authkey, str):
+            authkey = authkey.encode()
+        self.authkey = authkey
+        self.cpu_ids = get_cpu_ids()
+        if n_cpus is None:
+            n_cpus = len(self.cpu_ids)
+        self.n_cpus = n_cpus
+        self.pin_cpus = hasattr(os, "sched_setaffinity")
+        self.workers = dict()
+        self.max_batch_size = 1000
+        self.connection = None
+        self._send_lock = Lock()
+
+    def run(self):
+        self.connection = Client(self.address, authkey=self.authkey)
+        self.connection.send(("hello", dict(
+            host=socket.gethostname(), n_cpus=self.n_cpus,
+            memory=get_physical_memory())))
+
+        while True:
+            try:
+                message = self.connection.recv()
+
+            except (OSError, EOFError):
+                break
+
+            if message[0] == "submit":
+                self.submit(*message[1:])
+
+            elif message[0] == "cancel":
+                self.cancel(message[1])
+
+            elif message[0] == "close":
+                break
+
+        for job_id in list(self.workers):
+            self.cancel(job_id)
+        self.connection.close()
+
+    def send(self, message):
+        with self._send_lock:
+            self.connection.send(message)
+
+    def submit(self, job_id, func, config, slots, resume_state):
+        try:
+            func = pickle.loads(func)
+
+        except Exception:
+            traceback.print_exc()
+            self.send(("status", job_id, [JobReturn(dict(), False)]))
+            return
+
+        cpus = None
+        if slots is not None and self.pin_cpus:
+            cpus = sorted({self.cpu_ids[slot % len(self.cpu_ids)]
+                           for slot in slots})
+
+        worker = ProcessWorker()
+        self.workers[job_id] = worker
+        worker.submit(func, config, cpus, resume_state)
+        Thread(target=self.forward, args=(job_id, worker),
+               daemon=True).start()
+
+    def cancel(self, job_id):
+        worker = self.workers.pop(job_id, None)
+        if worker is not None:
+            worker.terminate()
+
+    def forward(self, job_id, worker):
+        finished = False
+        while not finished:
+            try:
+                batch = [worker.process_queue.get(timeout=.5)]
+
+            except Empty:
+                if worker.is_alive():
+                    continue
+
+                # died without a return, e.g. killed
+                batch = [JobReturn(dict(), False)]
+
+            except (OSError, ValueError):
+                # cancelled, the queue is closed
+                return
+
+            while len(batch) < self.max_batch_size:
+                try:
+                    batch.append(worker.process_queue.get_nowait())
+
+                except (Empty, OSError, ValueError):
+                    break
+
+            finished = any(isinstance(status, JobReturn) for status in batch)
+            try:
+                self.send(("status", job_id, [copy_shared_arrays(status)
+                                              for status in batch]))
+
+            except (OSError, EOFError, ValueError):
+                return
+
+        self.workers.pop(job_id, None)
+        worker.release()
+
+
+def copy_shared_arrays(status):
+    if not isinstance(status, dict):
+        return status
+
+    copied = dict()
+    for key, value in status.items():
+        if isinstance(value, SharedArray):
+            value = value.load()
+        copied[key] = value
+
+    return copied
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        description="Run the jobs of a remote juts scheduler.")
+    parser.add_argument("--host", default="localhost",
+                        help="host of the agent server")
+    parser.add_argument("--port", type=int, required=True,
+                        help="port of the agent server")
+    parser.add_argument("--authkey", default=os.environ.get("JUTS_AUTHKEY"),
+                        help="shared key, defaults to $JUTS_AUTHKEY")
+    parser.add_argument("--cpus", type=int, default=None,
+                        help="number of cpus to offer, all by default")
+    args = parser.parse_args(args)
+    if args.authkey is None:
+        parser.error("an authkey is required")
+
+    WorkerAgent((args.host, args.port), args.authkey, args.cpus).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+from itertools import count
+import heapq
+
+
+class FifoPolicy:
+    """
+    Serve jobs in the order they were queued.
+    """
+    def key(self, job, seq):
+        return (seq,)
+
+    def on_dispatch(self, job, key):
+        pass
+
+
+class PriorityPolicy:
+    """
+    Serve jobs with a higher `priority` first, FIFO among equal priorities.
+    """
+    def key(self, job, seq):
+        return -job.priority, seq
+
+    def on_dispatch(self, job, key):
+        pass
+
+
+class ShortestFirstPolicy:
+    """
+    Serve jobs with the shortest `expected_runtime` (seconds) first, jobs
+    without an estimate after all others.
+    """
+    def key(self, job, seq):
+        if job.expected_runtime is None:
+            return float("inf"), seq
+
+        return job.expected_runtime, seq
+
+    def on_dispatch(self, job, key):
+        pass
+
+
+class FairSharePolicy:
+    """
+    Round robin between the job groups (`job.group`): the n-th queued job of
+    every group is served in round n. A group which joins late starts in
+    the current round, hence can not starve the groups already queued.
+    """
+    def __init__(self):
+        self.group_rounds = dict()
+        self.current_round = 0
+
+    def key(self, job, seq):
+        round_ = max(self.group_rounds.get(job.group, 0), self.current_round)
+        self.group_rounds[job.group] = round_ + 1
+
+        return round_, seq
+
+    def on_dispatch(self, job, key):
+        self.current_round = key[0]
+
+
+class JobQueue:
+    """
+    Queue of jobs, ordered by a scheduling policy. It is backed by a heap
+    with lazy deletion, hence queueing, dispatching and removing a job is
+    O(log n). Indexing and iterating follows the dispatch order.
+    """
+    def __init__(self, policy=None):
+        if policy is None:
+            policy = FifoPolicy()
+
+        self.policy = policy
+        self._heap = list()
+        self._entries = dict()
+        self._counter = count()
+        self._ordered = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(self.ordered())
+
+    def __getitem__(self, index):
+        return self.ordered()[index]
+
+    def __contains__(self, job):
+        return id(job) in self._entries
+
+    def ordered(self):
+        if self._ordered is None:
+            entries = sorted(self._entries.values())
+            self._ordered = [entry[-1] for entry in entries]
+
+        return self._ordered
+
+    def append(self, job):
+        if job in self:
+            raise ValueError("Job is already queued.")
+
+        seq = next(self._counter)
+        entry = [self.policy.key(job, seq), seq, job]
+        self._entries[id(job)] = entry
+        heapq.heappush(self._heap, entry)
+        self._ordered = None
+
+    def extend(self, jobs):
+        for job in jobs:
+            self.append(job)
+
+    def remove(self, job):
+        entry = self._entries.pop(id(job))
+        # lazy deletion: the entry is skipped when it reaches the top
+        entry[-1] = None
+        self._ordered = None
+
+    def pop(self, index=None):
+        """
+        Remove and return the job at position `index` of the dispatch order,
+        the next job to dispatch if `index` is None.
+        """
+        if index is None:
+            return self.pop_next()
+
+        job = self.ordered()[index]
+        self.remove(job)
+
+        return job
+
+    def peek(self):
+        self._discard_removed()
+        if not self._heap:
+            raise IndexError("peek from an empty job queue")
+
+        return self._heap[0][-1]
+
+    def pop_next(self, fits=None, lookahead=1):
+        """
+        Remove and return the next job to dispatch. If `fits` is given, the
+        first of the next `lookahead` jobs for which `fits(job)` holds is
+        returned instead, None if there is none. Skipped jobs keep their
+        position.
+        """
+        self._discard_removed()
+        if not self._heap:
+            raise IndexError("pop from an empty job queue")
+
+        skipped = list()
+        try:
+            while self._heap and len(skipped) < lookahead:
+                entry = heapq.heappop(self._heap)
+                key, seq, job = entry
+                if job is None:
+                    continue
+
+                if fits is None or fits(job):
+                    del self._entries[id(job)]
+                    self._ordered = None
+                    self.policy.on_dispatch(job, key)
+
+                    return job
+
+                skipped.append(entry)
+
+        finally:
+            for entry in skipped:
+                heapq.heappush(self._heap, entry)
+
+        return None
+
+    def set_policy(self, policy):
+        jobs = [entry[-1] for entry in sorted(self._entries.values())]
+        self.policy = policy
+        self._heap = list()
+        self._entries = dict()
+        self._ordered = None
+        self.extend(jobs)
+
+    def _discard_removed(self):
+        while self._heap and self._heap[0][-1] is None:
+            heapq.heappop(self._heap)
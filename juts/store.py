@@ -0,0 +1,330 @@
+from .container import Hook, OutputWidgetHandler, dump_configurations, \
+    load_configs_from_file
+from collections import OrderedDict
+from collections.abc import Mapping
+from datetime import datetime as dt
+import numpy as np
+import pickle
+import yaml
+import os
+import re
+
+
+class StoredArray:
+    """
+    Read-only, array-like view on a result which is stored in chunks along
+    its first axis. Indexing and slicing only loads the chunks it touches,
+    uncompressed chunks are memory-mapped.
+    """
+    def __init__(self, chunk_files, chunk_lengths, dtype, shape):
+        self.chunk_files = chunk_files
+        self.chunk_offsets = np.cumsum([0] + list(chunk_lengths))
+        self.dtype = np.dtype(dtype)
+        self.shape = tuple(shape)
+        self._chunks = dict()
+
+    def __repr__(self):
+        return "StoredArray(shape={}, dtype={})".format(self.shape, self.dtype)
+
+    def __len__(self):
+        return self.shape[0]
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    def __iter__(self):
+        for i in range(len(self.chunk_files)):
+            yield from self.get_chunk(i)
+
+    def __array__(self, dtype=None, copy=None):
+        array = self[:]
+        if dtype is not None:
+            array = array.astype(dtype)
+
+        return array
+
+    def __getitem__(self, key):
+        if isinstance(key, tuple):
+            if len(key) == 0:
+                return self[:]
+
+            return self[key[0]][(slice(None),) * isinstance(key[0], slice)
+                                + key[1:]]
+
+        if isinstance(key, (int, np.integer)):
+            index = range(len(self))[key]
+            chunk = np.searchsorted(self.chunk_offsets, index, "right") - 1
+            return self.get_chunk(chunk)[index - self.chunk_offsets[chunk]]
+
+        if isinstance(key, slice):
+            indices = range(len(self))[key]
+            if len(indices) == 0:
+                return np.empty((0,) + self.shape[1:], self.dtype)
+
+            start = min(indices[0], indices[-1])
+            stop = max(indices[0], indices[-1]) + 1
+            first = np.searchsorted(self.chunk_offsets, start, "right") - 1
+            last = np.searchsorted(self.chunk_offsets, stop - 1, "right") - 1
+            parts = [self.get_chunk(i) for i in range(first, last + 1)]
+            if len(parts) == 1:
+                data = parts[0]
+            else:
+                data = np.concatenate(parts)
+
+            offset = self.chunk_offsets[first]
+            if indices.step == 1:
+                return data[start - offset:stop - offset]
+
+            return data[np.asarray(indices) - offset]
+
+        key = np.asarray(key)
+        if key.dtype.kind in "iu":
+            return self.take(key)
+
+        return self[:][key]
+
+    def take(self, indices):
+        """
+        Return the samples at the integer array `indices`, only the chunks
+        which contain one of them are loaded.
+        """
+        indices = np.where(indices < 0, indices + len(self), indices)
+        chunks = np.searchsorted(self.chunk_offsets, indices, "right") - 1
+        data = np.empty(indices.shape + self.shape[1:], self.dtype)
+        for chunk in np.unique(chunks):
+            selected = chunks == chunk
+            data[selected] = self.get_chunk(chunk)[
+                indices[selected] - self.chunk_offsets[chunk]]
+
+        return data
+
+    def get_chunk(self, index):
+        if index not in self._chunks:
+            filename = self.chunk_files[index]
+            if filename.endswith(".npz"):
+                # compressed chunks are kept until the next one is needed
+                self._chunks = {index: np.load(filename)["data"]}
+            else:
+                self._chunks[index] = np.load(filename, mmap_mode="r")
+
+        return self._chunks[index]
+
+
+class StoredResult(Mapping):
+    """
+    Result of a stored job, the values are loaded on first access.
+    """
+    def __init__(self, directory, entries):
+        self.directory = directory
+        self.entries = OrderedDict((entry["key"], entry) for entry in entries)
+        self._values = dict()
+
+    def __getitem__(self, key):
+        if key not in self._values:
+            self._values[key] = self.load(self.entries[key])
+
+        return self._values[key]
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def load(self, entry):
+        path = os.path.join(self.directory, entry["path"])
+        chunk_files = [os.path.join(path, chunk) for chunk in entry["chunks"]]
+        if entry["kind"] == "pickle":
+            with open(chunk_files[0], "rb") as f:
+                return pickle.load(f)
+
+        if entry["kind"] == "scalar":
+            return np.load(chunk_files[0])[()]
+
+        if len(chunk_files) == 1 and chunk_files[0].endswith(".npy"):
+            return np.load(chunk_files[0], mmap_mode="r")
+
+        return StoredArray(chunk_files, entry["chunk_lengths"],
+                           entry["dtype"], entry["shape"])
+
+
+class StoredJob:
+    """
+    Finished job reopened from a :py:class:`ResultStore`. It provides the
+    parts of the :py:class:`Job` interface which are used by the views and
+    plots, its results are memory-mapped.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, "meta.yml"), "r") as f:
+            self.meta = yaml.safe_load(f)
+
+        self.name = self.meta["name"]
+        self.job_is_alive = False
+        self.progress_value = self.meta["progress"]
+        self.result = StoredResult(directory, self.meta["results"])
+        self.schema_version = 0
+        self.live_result_update = Hook()
+        self.job_finished = Hook()
+
+        self._config = None
+        self.log_handler = OutputWidgetHandler()
+        log_file = os.path.join(directory, "log.txt")
+        if os.path.exists(log_file):
+            self.log_handler.load(log_file)
+
+    def get_config(self):
+        if self._config is None:
+            filename = os.path.join(self.directory, "config.yml")
+            self._config = load_configs_from_file(filename)[0]
+
+        return self._config
+
+    config = property(get_config)
+
+    def get_func(self):
+        def stored_function(config, process_queue=None, return_dict=None):
+            raise NotImplementedError(
+                "The function of a stored job can not be run.")
+
+        stored_function.__name__ = self.meta["function"]
+        return stored_function
+
+    func = property(get_func)
+
+    def is_alive(self):
+        return False
+
+    def discard(self):
+        # the log file belongs to the store, hence it is kept
+        self.log_handler.close()
+
+
+class ResultStore:
+    """
+    Stores the results of finished jobs in a local directory, one
+    sub-directory per job, containing its configuration (`config.yml`),
+    metadata (`meta.yml`), log (`log.txt`) and the results. Numeric results
+    are written as numpy arrays, split into chunks of at most
+    `chunk_bytes` along their first axis; all other values are pickled.
+
+    Uncompressed chunks (`.npy`) are memory-mapped on reading. With
+    `compress` the chunks are written as compressed `.npz` files, which
+    saves disk space but are decompressed chunk by chunk on access.
+    """
+    def __init__(self, directory="juts_results", chunk_bytes=2 ** 24,
+                 compress=False):
+        self.directory = directory
+        self.chunk_bytes = chunk_bytes
+        self.compress = compress
+
+    def get_job_directory(self, job):
+        name = re.sub(r"[^\w\-.]+", "_", job.name).strip("_")
+        return os.path.join(self.directory, "{}-{}".format(
+            dt.now().strftime("%Y-%m-%d-%H-%M-%S-%f"), name))
+
+    def save(self, job, directory=None):
+        """
+        Save the finished `job` and return its directory.
+        """
+        if directory is None:
+            directory = self.get_job_directory(job)
+        os.makedirs(os.path.join(directory, "results"))
+
+        dump_configurations(os.path.join(directory, "config.yml"),
+                            [job.config])
+
+        with open(os.path.join(directory, "log.txt"), "w") as f:
+            f.write("\n".join(job.log_handler.get_all_lines()))
+
+        entries = self.save_result(directory, job.result)
+        meta = OrderedDict([
+            ("name", job.name),
+            ("function", job.func.__name__),
+            ("module", getattr(job.func, "__module__", None)),
+            ("saved", dt.now().isoformat()),
+            ("progress", float(job.progress_value)),
+            ("results", entries),
+        ])
+        with open(os.path.join(directory, "meta.yml"), "w") as f:
+            yaml.safe_dump(as_plain_data(meta), f, sort_keys=False)
+
+        return directory
+
+    def save_result(self, directory, result):
+        entries = list()
+        for i, (key, value) in enumerate(result.items()):
+            path = os.path.join("results", str(i))
+            entry = self.save_value(os.path.join(directory, path), value)
+            entry.update(key=key, path=path)
+            entries.append(entry)
+
+        return entries
+
+    def save_value(self, path, value):
+        try:
+            array = np.asarray(value)
+        except ValueError:
+            array = None
+
+        os.makedirs(path)
+        if array is None or array.dtype.kind not in "biufc":
+            with open(os.path.join(path, "0.pkl"), "wb") as f:
+                pickle.dump(value, f)
+
+            return dict(kind="pickle", chunks=["0.pkl"])
+
+        if array.ndim == 0:
+            np.save(os.path.join(path, "0.npy"), array)
+
+            return dict(kind="scalar", chunks=["0.npy"])
+
+        row_bytes = max(1, array[:1].nbytes)
+        chunk_length = max(1, self.chunk_bytes // row_bytes)
+        chunks = list()
+        chunk_lengths = list()
+        for i, start in enumerate(range(0, max(len(array), 1), chunk_length)):
+            chunk = array[start:start + chunk_length]
+            if self.compress:
+                chunks.append("{}.npz".format(i))
+                np.savez_compressed(os.path.join(path, chunks[-1]), data=chunk)
+            else:
+                chunks.append("{}.npy".format(i))
+                np.save(os.path.join(path, chunks[-1]), chunk)
+            chunk_lengths.append(len(chunk))
+
+        return dict(kind="array", dtype=array.dtype.str,
+                    shape=list(array.shape), chunks=chunks,
+                    chunk_lengths=chunk_lengths)
+
+    def load(self, name):
+        """
+        Reopen the job stored in the sub-directory `name`.
+        """
+        return StoredJob(os.path.join(self.directory, name))
+
+    def list_jobs(self):
+        if not os.path.isdir(self.directory):
+            return list()
+
+        return sorted(name for name in os.listdir(self.directory)
+                      if os.path.exists(os.path.join(
+                            self.directory, name, "meta.yml")))
+
+    def load_all(self):
+        return [self.load(name) for name in self.list_jobs()]
+
+
+def as_plain_data(data):
+    if isinstance(data, Mapping):
+        return {as_plain_data(key): as_plain_data(value)
+                for key, value in data.items()}
+
+    if isinstance(data, (list, tuple)):
+        return [as_plain_data(value) for value in data]
+
+    if isinstance(data, np.generic):
+        return data.item()
+
+    return data
@@ -0,0 +1,143 @@
+from .container import Configuration, Job
+from collections import OrderedDict
+import numpy as np
+
+
+class Sweep:
+    """
+    Parameter sweep, attached to a :py:class:`Configuration` as its `sweep`.
+    The configurations of the sweep are the base configuration with the
+    swept parameters replaced, they are created on demand.
+
+    Args:
+        parameters: Mapping from "parameter_set.parameter" to the values,
+            for the modes "random" and "latin" to the bounds (low, high).
+        mode: How the values are combined:
+
+            - "product": Cartesian product of the values.
+            - "zip": The i-th values of all parameters, they must have
+              equal lengths.
+            - "random": `n_samples` independent uniform samples.
+            - "latin": `n_samples` samples of a Latin hypercube, every
+              parameter range is split into `n_samples` strata which are
+              sampled once each.
+        n_samples: Number of samples of the modes "random" and "latin".
+        seed: Seed of the sampling.
+    """
+    modes = ("product", "zip", "random", "latin")
+
+    def __init__(self, parameters, mode="product", n_samples=None, seed=None):
+        if mode not in self.modes:
+            raise ValueError("Unknown sweep mode {}, use one of {}.".format(
+                mode, self.modes))
+
+        self.parameters = OrderedDict()
+        for key, values in parameters.items():
+            param_set, sep, param = key.partition(".")
+            if not sep:
+                raise ValueError("Swept parameters are given as "
+                                 "'parameter_set.parameter', not {}".format(key))
+            values = list(values)
+            if not values:
+                raise ValueError("No values given for {}".format(key))
+            self.parameters[(param_set, param)] = values
+
+        self.mode = mode
+        self.n_samples = n_samples
+        self.seed = seed
+        self._samples = None
+
+        if mode in ("random", "latin"):
+            if n_samples is None:
+                raise ValueError("Sampling needs n_samples.")
+            for key, values in parameters.items():
+                if len(values) != 2:
+                    raise ValueError("Give the bounds (low, high) of "
+                                     "{}".format(key))
+
+        elif mode == "zip":
+            if len(set(len(values) for values in
+                       self.parameters.values())) > 1:
+                raise ValueError("Zipped parameters need equal lengths.")
+
+    def __repr__(self):
+        return "Sweep({}, {} configurations)".format(self.mode, len(self))
+
+    def __len__(self):
+        if self.mode == "product":
+            return int(np.prod([len(values) for values in
+                                self.parameters.values()]))
+
+        if self.mode == "zip":
+            return len(next(iter(self.parameters.values())))
+
+        return self.n_samples
+
+    def get_samples(self):
+        if self._samples is None:
+            rng = np.random.default_rng(self.seed)
+            shape = (self.n_samples, len(self.parameters))
+            if self.mode == "random":
+                samples = rng.random(shape)
+
+            else:
+                strata = np.argsort(rng.random(shape), axis=0)
+                samples = (strata + rng.random(shape)) / self.n_samples
+
+            bounds = np.array(list(self.parameters.values()), dtype=float)
+            self._samples = bounds[:, 0] + samples * np.diff(bounds).T
+
+        return self._samples
+
+    def get_values(self, index):
+        """
+        Values of the swept parameters of the `index`-th configuration.
+        """
+        index = range(len(self))[index]
+        if self.mode == "product":
+            shape = [len(values) for values in self.parameters.values()]
+            indices = np.unravel_index(index, shape)
+            return [values[i] for values, i in
+                    zip(self.parameters.values(), indices)]
+
+        if self.mode == "zip":
+            return [values[index] for values in self.parameters.values()]
+
+        return [float(value) for value in self.get_samples()[index]]
+
+    def get_configuration(self, base, index):
+        settings = OrderedDict((name, OrderedDict(params))
+                               for name, params in base.settings.items())
+        for (param_set, param), value in zip(self.parameters,
+                                             self.get_values(index)):
+            settings.setdefault(param_set, OrderedDict())[param] = value
+
+        return Configuration("{}[{}]".format(base.name, index), settings)
+
+    def to_dict(self):
+        sweep = OrderedDict([("mode", self.mode)])
+        if self.n_samples is not None:
+            sweep["n_samples"] = self.n_samples
+        if self.seed is not None:
+            sweep["seed"] = self.seed
+        sweep["parameters"] = OrderedDict(
+            (".".join(key), values) for key, values in self.parameters.items())
+
+        return sweep
+
+    @staticmethod
+    def from_dict(sweep):
+        return Sweep(sweep["parameters"], mode=sweep.get("mode", "product"),
+                     n_samples=sweep.get("n_samples"), seed=sweep.get("seed"))
+
+
+def sweep_jobs(func, config, **kwargs):
+    """
+    Create the jobs of all configurations of `config`, lazily. The keyword
+    arguments are passed on to :py:class:`Job`, the jobs of a sweep form one
+    `group` by default.
+    """
+    if kwargs.get("group") is None:
+        kwargs["group"] = config.name
+    for sweep_config in config.expand():
+        yield Job(func, sweep_config, **kwargs)
@@ -0,0 +1,82 @@
+from unittest import TestCase
+import juts as jt
+import asyncio
+import time
+
+
+def counting_function(config, process_queue=None, return_dict=None):
+    n = config["parameter"]["n"]
+    for i in range(n):
+        process_queue.put(dict(progress=100 * i / n, time=i))
+        time.sleep(config["parameter"]["t"])
+    return_dict.update(total=n)
+
+
+counting_config = jt.Configuration(
+    "counting", dict(parameter=dict(n=20, t=.01)))
+
+
+class TestAsyncio(TestCase):
+    def setUp(self):
+        self.scheduler = jt.JobScheduler()
+        self.scheduler.start()
+        self.scheduler.start_queue()
+
+    def tearDown(self):
+        self.scheduler.shutdown()
+
+    def test_wait(self):
+        async def main():
+            jobs = [await self.scheduler.submit(counting_function,
+                                                counting_config)
+                    for _ in range(2)]
+            return await asyncio.gather(*[job.wait() for job in jobs])
+
+        results = asyncio.run(main())
+        self.assertEqual([result["total"] for result in results], [20, 20])
+
+    def test_stream(self):
+        async def main():
+            job = await self.scheduler.submit(counting_function,
+                                              counting_config,
+                                              queue_timeout=.05)
+            samples = list()
+            async for batch in job.stream():
+                samples.extend(batch["time"])
+            return job, samples
+
+        job, samples = asyncio.run(main())
+        self.assertEqual(list(samples), list(range(20)))
+        self.assertFalse(job.job_is_alive)
+
+    def test_finished_job(self):
+        job = jt.Job(counting_function, jt.Configuration(
+            "short", dict(parameter=dict(n=2, t=0))))
+        job.start()
+        job.join()
+
+        async def main():
+            batches = [batch async for batch in job.stream()]
+            return batches, await job.wait()
+
+        batches, result = asyncio.run(main())
+        self.assertEqual(batches, [])
+        self.assertEqual(result["total"], 2)
+
+    def test_cancelled_queued_job(self):
+        self.scheduler.pause_queue()
+
+        async def main():
+            jobs = [await self.scheduler.submit(counting_function,
+                                                counting_config)
+                    for _ in range(2)]
+            loop = asyncio.get_running_loop()
+            loop.call_later(.05, self.scheduler.cancel_job, jobs[0])
+            loop.call_later(.05, self.scheduler.pop_queue_job, 0)
+            return await asyncio.wait_for(
+                asyncio.gather(*[job.wait() for job in jobs]), 5)
+
+        results = asyncio.run(main())
+        self.assertEqual([len(result) for result in results], [0, 0])
+        self.assertEqual(len(self.scheduler.queue_jobs), 0)
+        self.assertEqual(len(self.scheduler.done_jobs), 1)
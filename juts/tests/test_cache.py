@@ -0,0 +1,153 @@
+from unittest import TestCase
+from unittest.mock import patch
+from tempfile import TemporaryDirectory
+from collections import OrderedDict
+import juts as jt
+import numpy as np
+import time
+
+
+def cached_function(config, process_queue=None, return_dict=None):
+    for i in range(config["parameter"]["n"]):
+        process_queue.put(dict(time=i, value=float(i) * config["parameter"]["a"]))
+
+
+def other_function(config, process_queue=None, return_dict=None):
+    process_queue.put(dict(time=0))
+
+
+def raising_function(config, process_queue=None, return_dict=None):
+    return_dict.update(partial=True)
+    raise RuntimeError("failed")
+
+
+def cached_config(n=100, a=2., name="cached"):
+    return jt.Configuration(name, dict(parameter=dict(n=n, a=a)))
+
+
+class TestJobKey(TestCase):
+    def test_stable(self):
+        key = jt.job_key(cached_function, cached_config())
+        self.assertEqual(key, jt.job_key(cached_function, cached_config()))
+        # the name of the configuration and the order of the settings and
+        # int or float do not matter
+        reordered = jt.Configuration("other", OrderedDict(
+            parameter=OrderedDict([("a", 2), ("n", 100)])))
+        self.assertEqual(key, jt.job_key(cached_function, reordered))
+
+        self.assertNotEqual(key, jt.job_key(cached_function,
+                                            cached_config(a=3.)))
+        self.assertNotEqual(key, jt.job_key(other_function, cached_config()))
+
+
+class TestResultCache(TestCase):
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_jobs(self, scheduler, jobs):
+        for job in jobs:
+            scheduler.append_queue_job(job)
+        while len(scheduler.done_jobs) < len(jobs):
+            time.sleep(.01)
+
+    def test_scheduler(self):
+        cache = jt.ResultCache(self.tmp.name)
+        scheduler = jt.JobScheduler(result_cache=cache)
+        scheduler.start()
+        scheduler.start_queue()
+
+        job = jt.Job(cached_function, cached_config())
+        self.run_jobs(scheduler, [job])
+        self.assertEqual(cache.stats()["misses"], 1)
+        self.assertEqual(len(cache), 1)
+
+        # not started, finished right away
+        again = jt.Job(cached_function, cached_config(name="again"))
+        scheduler.append_queue_job(again)
+        self.assertIn(again, scheduler.done_jobs)
+        self.assertFalse(again.is_alive())
+        self.assertEqual(again.progress_value, 100)
+        self.assertEqual(cache.stats()["hits"], 1)
+        np.testing.assert_array_equal(again.result["value"],
+                                      job.result["value"])
+        scheduler.shutdown()
+
+        # persistent
+        self.assertIn(job.cache_key, jt.ResultCache(self.tmp.name))
+
+    def test_failed_job(self):
+        cache = jt.ResultCache(self.tmp.name)
+        scheduler = jt.JobScheduler(result_cache=cache)
+        scheduler.start()
+        scheduler.start_queue()
+
+        job = jt.Job(raising_function, cached_config())
+        self.run_jobs(scheduler, [job])
+        self.assertEqual(job.progress_style, "danger")
+        self.assertEqual(len(cache), 0)
+
+        again = jt.Job(raising_function, cached_config())
+        scheduler.append_queue_job(again)
+        while len(scheduler.done_jobs) < 2:
+            time.sleep(.01)
+        scheduler.shutdown()
+        self.assertEqual(cache.stats()["hits"], 0)
+        self.assertEqual(cache.stats()["misses"], 2)
+
+    def test_eviction(self):
+        cache = jt.ResultCache(self.tmp.name)
+        jobs = [jt.Job(cached_function, cached_config(n=1000, a=a))
+                for a in range(3)]
+        for job in jobs:
+            job.start()
+            job.join()
+            cache.put(jt.job_key(job.func, job.config), job)
+        keys = [jt.job_key(job.func, job.config) for job in jobs]
+
+        # the last job is the least recently used after this
+        cache.get(keys[0])
+        cache.get(keys[1])
+        cache.max_bytes = cache.size - 1
+        cache.evict()
+        self.assertNotIn(keys[2], cache)
+        self.assertIn(keys[0], cache)
+
+        cache.max_bytes = 0
+        cache.evict()
+        self.assertEqual(list(cache._index), [keys[1]])
+        self.assertEqual(cache.stats()["hits"], 2)
+
+    def test_bulk_hits(self):
+        cache = jt.ResultCache(self.tmp.name)
+        jobs = [jt.Job(cached_function, cached_config(n=10, a=a))
+                for a in range(20)]
+        for job in jobs:
+            job.start()
+            job.join()
+            cache.put(jt.job_key(job.func, job.config), job)
+
+        scheduler = jt.JobScheduler(result_cache=cache)
+        changes = list()
+        scheduler.job_change.connect(changes.append)
+        syncs = list()
+        scheduler.sync_done.connect(lambda: syncs.append(None))
+        again = [jt.Job(cached_function, cached_config(n=10, a=a))
+                 for a in reversed(range(20))]
+        with patch.object(cache, "dump_index",
+                          wraps=cache.dump_index) as dump_index:
+            scheduler.extend_queue_jobs(again)
+
+        self.assertEqual(cache.stats()["hits"], 20)
+        self.assertEqual(dump_index.call_count, 1)
+        self.assertEqual([(c.kind, c.source, len(c.jobs)) for c in changes],
+                         [("inserted", "done", 20)])
+        self.assertEqual(len(syncs), 1)
+        self.assertEqual(len(scheduler.queue_jobs), 0)
+
+        # the times of last use are persistent
+        reloaded = jt.ResultCache(self.tmp.name)
+        self.assertEqual(list(reloaded._index),
+                         [job.cache_key for job in again])
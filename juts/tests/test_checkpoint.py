@@ -0,0 +1,80 @@
+from unittest import TestCase
+from tempfile import TemporaryDirectory
+import juts as jt
+import numpy as np
+import time
+
+
+def resumable_function(config, process_queue=None, return_dict=None,
+                       checkpoint=None):
+    n = config["parameter"]["n"]
+    start = 0 if checkpoint.state is None else checkpoint.state["step"]
+    process_queue.put(dict(start=start))
+    for i in range(start, n):
+        process_queue.put(dict(progress=100 * i / n, time=i,
+                               label="step {}".format(i)))
+        if i % 10 == 9:
+            checkpoint.save(dict(step=i + 1))
+        time.sleep(config["parameter"]["t"])
+
+
+resumable_config = jt.Configuration(
+    "resumable", dict(parameter=dict(n=100, t=.01)))
+
+
+class TestCheckpoint(TestCase):
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.store = jt.CheckpointStore(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_resume(self):
+        job = jt.Job(resumable_function, resumable_config, queue_timeout=.05,
+                     checkpoint_store=self.store)
+        job.start()
+        while len(job.result.get("time", [])) < 35:
+            time.sleep(.01)
+        job.cancel()
+        job.join()
+        self.assertTrue(job.cancelled)
+        self.assertIn(job.checkpoint_key, self.store)
+
+        resumed = jt.Job(resumable_function, resumable_config,
+                         checkpoint_store=self.store)
+        resumed.start()
+        resumed.join()
+
+        self.assertEqual(resumed.result["start"][0], 0)
+        self.assertGreaterEqual(resumed.result["start"][1], 30)
+        self.assertEqual(resumed.progress_value, 100)
+        self.assertIn("resume from checkpoint", "\n".join(
+            resumed.log_handler.lines))
+        # every step once, restored and newly computed samples together
+        np.testing.assert_array_equal(resumed.result["time"], np.arange(100))
+        self.assertEqual(resumed.result["label"][-1], "step 99")
+        # done, the checkpoint is not needed anymore
+        self.assertNotIn(resumed.checkpoint_key, self.store)
+
+    def test_scheduler(self):
+        scheduler = jt.JobScheduler(checkpoint_store=self.store)
+        scheduler.start()
+        job = jt.Job(resumable_function, resumable_config)
+        scheduler.append_queue_job(job)
+        scheduler.start_queue()
+        while not scheduler.done_jobs:
+            time.sleep(.01)
+        scheduler.shutdown()
+
+        self.assertIs(job.checkpoint_store, self.store)
+        self.assertEqual(list(job.result["start"]), [0])
+        self.assertNotIn(job.checkpoint_key, self.store)
+
+    def test_without_checkpoint_argument(self):
+        job = jt.Job(lambda config, process_queue=None, return_dict=None:
+                     return_dict.update(done=True), resumable_config,
+                     checkpoint_store=self.store)
+        job.start()
+        job.join()
+        self.assertTrue(job.result["done"])
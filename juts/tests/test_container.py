@@ -1,10 +1,21 @@
-from unittest import TestCase
+from unittest import TestCase, skipUnless
 import juts as jt
 import time
 from juts import (Configuration, load_configs_from_file, dump_configurations, Job)
 from collections import OrderedDict
+import numpy as np
+from threading import Thread
+import subprocess
+import sys
+from queue import Queue
+import logging
 import os
 
+try:
+    import resource
+except ImportError:
+    resource = None
+
 
 settings = dict({
     "params_1": dict({
@@ -27,6 +38,83 @@ def function(config, process_queue=None, return_dict=None):
         time.sleep(.5)
 
 
+def live_function(config, process_queue=None, return_dict=None):
+    for i in range(config["parameter"]["n"]):
+        process_queue.put(dict(progress=i, time=i, series=[i, -i]))
+
+
+def field_function(config, process_queue=None, return_dict=None):
+    for i in range(config["parameter"]["n"]):
+        field = np.full((20, 30), float(i))
+        process_queue.put(dict(time=i, field=jt.share_array(field)))
+
+
+def shared_function(config, process_queue=None, return_dict=None):
+    for i in range(config["parameter"]["n"]):
+        process_queue.put(dict(time=i, field=jt.share_array(np.zeros(10))))
+    time.sleep(config["parameter"]["t"])
+
+
+def shared_segments():
+    return set(name for name in os.listdir("/dev/shm")
+               if name.startswith("psm_"))
+
+
+def return_function(config, process_queue=None, return_dict=None):
+    for i in range(1000):
+        return_dict.update({"value_{}".format(i % 10): i})
+    return_dict.update(dict(time=[0, 1, 2]))
+
+
+def printing_function(config, process_queue=None, return_dict=None):
+    print("hello from the worker")
+    logging.getLogger("model").info("solver converged")
+    for i in range(config["parameter"]["n"]):
+        print("step", i)
+    raise RuntimeError("diverged")
+
+
+def child_function(config, process_queue=None, return_dict=None):
+    import multiprocessing
+
+    child = multiprocessing.Process(target=time.sleep, args=(0,))
+    child.start()
+    child.join()
+    return_dict.update(exitcode=child.exitcode)
+
+
+def pid_function(config, process_queue=None, return_dict=None):
+    process_queue.put(dict(progress=100))
+    return_dict.update(dict(pid=os.getpid()))
+
+
+def sleep_function(config, process_queue=None, return_dict=None):
+    time.sleep(config["parameter"]["t"])
+
+
+def affinity_function(config, process_queue=None, return_dict=None):
+    time.sleep(.2)
+    return_dict.update(dict(cpus=sorted(os.sched_getaffinity(0)),
+                            threads=os.environ["OMP_NUM_THREADS"]))
+
+
+def busy_function(config, process_queue=None, return_dict=None):
+    process_queue.put(dict(pid=os.getpid()))
+    t0 = time.time()
+    while time.time() - t0 < config["parameter"]["t"]:
+        pass
+
+
+def stubborn_function(config, process_queue=None, return_dict=None):
+    import signal
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    process_queue.put(dict(pid=os.getpid()))
+    time.sleep(config["parameter"]["t"])
+
+
+live_config = Configuration("live", dict(parameter=dict(n=500)))
+
+
 class TestConfiguration(TestCase):
     def test_load_dump(self):
         filename = "configs_temp_test.yml"
@@ -41,3 +129,459 @@ class TestJob(TestCase):
         job.start()
         job.join()
 
+    def test_merge_status_batch(self):
+        batch = [dict(progress=1, time=0), dict(time=1, value=2),
+                 dict(progress=3)]
+        progress, columns = Job.merge_status_batch(batch)
+        self.assertEqual(progress, 3)
+        self.assertEqual(columns, dict(time=[0, 1], value=[2]))
+
+    def test_batched_drain(self):
+        job = Job(live_function, live_config, max_batch_size=100)
+        updates = list()
+        job.live_result_update.connect(updates.append)
+        job.start()
+        job.join()
+
+        self.assertEqual(job.result["time"].tolist(), list(range(500)))
+        self.assertEqual(job.result["series"].shape, (500, 2))
+        self.assertEqual(sum(len(update["time"]) for update in updates), 500)
+
+        # a filled queue is drained in full batches
+        process_queue = Queue()
+        for i in range(500):
+            process_queue.put(dict(progress=i, time=i, series=[i, -i]))
+        job = Job(live_function, live_config, max_batch_size=100)
+        updates = list()
+        job.live_result_update.connect(updates.append)
+        while not process_queue.empty():
+            job.process_queue_get(process_queue)
+
+        self.assertEqual(len(updates), 5)
+        self.assertEqual(list(updates[1]["time"]), list(range(100, 200)))
+        self.assertEqual(job.progress_value, 499)
+
+    def test_schema_version(self):
+        job = Job(live_function, live_config, max_batch_size=100)
+        job.start()
+        job.join()
+
+        # the keys of the first batch and the final result
+        self.assertEqual(job.schema_version, 2)
+
+    def test_worker_log(self):
+        job = Job(printing_function, live_config)
+        job.start()
+        job.join()
+
+        log = "\n".join(job.log_handler.lines)
+        self.assertIn("INFO - stdout: hello from the worker", log)
+        self.assertIn("INFO - model: solver converged", log)
+        self.assertIn("RuntimeError: diverged", log)
+        self.assertLess(log.index("hello from the worker"),
+                        log.index("join process"))
+
+    def test_worker_log_rate_limit(self):
+        flood_config = Configuration("flood", dict(parameter=dict(n=10 ** 5)))
+        job = Job(printing_function, flood_config)
+        t0 = time.time()
+        job.start()
+        job.join()
+
+        self.assertLess(time.time() - t0, 10)
+        log = "\n".join(job.log_handler.get_all_lines())
+        self.assertIn("lines of the worker dropped", log)
+        self.assertLess(log.count("stdout: step"), 10 ** 5)
+        job.discard()
+
+    def test_return_dict(self):
+        job = Job(return_function, live_config)
+        job.start()
+        job.join()
+
+        self.assertEqual(job.result["value_9"], 999)
+        self.assertEqual(job.result["time"], [0, 1, 2])
+
+
+class TestLiveResult(TestCase):
+    def test_columns(self):
+        live_result = jt.LiveResult()
+        for i in range(200):
+            live_result.append(dict(time=i, series=[i, 2 * i]))
+
+        self.assertEqual(live_result["time"].shape, (200,))
+        self.assertEqual(live_result["series"].shape, (200, 2))
+        self.assertEqual(live_result["series"][-1].tolist(), [199, 398])
+
+    def test_promotion(self):
+        live_result = jt.LiveResult()
+        live_result.append(dict(value=1))
+        live_result.append(dict(value=1.5))
+        self.assertEqual(live_result["value"].dtype.kind, "f")
+        self.assertEqual(live_result["value"].tolist(), [1., 1.5])
+
+        live_result.append(dict(value="text"))
+        self.assertEqual(live_result["value"].dtype, object)
+        self.assertEqual(list(live_result["value"]), [1., 1.5, "text"])
+
+    def test_schema_version(self):
+        live_result = jt.LiveResult()
+        live_result.append(dict(time=0, value=1))
+        self.assertEqual(live_result.schema_version, 2)
+        for i in range(100):
+            live_result.append(dict(time=i, value=i))
+        self.assertEqual(live_result.schema_version, 2)
+
+        live_result.append(dict(value=1.5))
+        live_result.append(dict(label="text"))
+        self.assertEqual(live_result.schema_version, 4)
+
+    def test_views(self):
+        live_result = jt.LiveResult()
+        live_result.append(dict(time=0.))
+        view = live_result["time"]
+        live_result.append(dict(time=1.))
+        self.assertEqual(len(view), 1)
+        self.assertEqual(len(live_result.to_result()["time"]), 2)
+
+
+class TestOutputWidgetHandler(TestCase):
+    def setUp(self):
+        self.handler = jt.OutputWidgetHandler(max_lines=50, flush_interval=.05)
+        self.logger = logging.Logger("juts.test")
+        self.logger.addHandler(self.handler)
+
+    def tearDown(self):
+        self.handler.close()
+
+    def test_spill(self):
+        for i in range(1000):
+            self.logger.info("line {}".format(i))
+
+        self.assertEqual(len(self.handler.lines), 50)
+        self.assertEqual(self.handler.lines[-1], "line 999")
+        lines = self.handler.get_all_lines()
+        self.assertEqual(lines, ["line {}".format(i) for i in range(1000)])
+        self.assertEqual(self.handler.n_spilled, 950)
+
+        log_file = self.handler.log_file
+        self.handler.close()
+        self.assertFalse(os.path.exists(log_file))
+
+    def test_multiline_records(self):
+        for i in range(200):
+            self.logger.info("record {}\nsecond line".format(i))
+
+        lines = self.handler.get_all_lines()
+        self.assertEqual(len(lines), 400)
+        self.assertEqual(lines[-2:], ["record 199", "second line"])
+        self.assertEqual(self.handler.n_spilled, 300)
+
+        handler = jt.OutputWidgetHandler(max_lines=50)
+        handler.load(self.handler.log_file)
+        self.assertEqual(handler.get_all_lines(), lines[:300])
+        handler.close()
+        self.assertTrue(os.path.exists(self.handler.log_file))
+
+    def test_batched_output(self):
+        out = self.handler.out
+        outputs = list()
+        out.observe(lambda change: outputs.append(change["new"]),
+                    names="outputs")
+        for i in range(500):
+            self.logger.info("line {}".format(i))
+        time.sleep(.2)
+
+        self.assertLess(len(outputs), 10)
+        text = out.outputs[0]["text"].splitlines()
+        self.assertEqual(text[0], "line 499")
+        self.assertEqual(len(text), 50)
+
+
+class TestSharedArray(TestCase):
+    def test_round_trip(self):
+        handle = jt.share_array(np.arange(6.).reshape(2, 3))
+        live_result = jt.LiveResult()
+        live_result.append(dict(field=handle))
+        self.assertEqual(live_result["field"][0].tolist(),
+                         [[0., 1., 2.], [3., 4., 5.]])
+
+        result = live_result.to_result()
+        live_result.release()
+        self.assertEqual(result["field"].shape, (1, 2, 3))
+        self.assertFalse(os.path.exists("/dev/shm/" + handle.name.lstrip("/")))
+
+    def test_job(self):
+        job = Job(field_function, Configuration("field", dict(
+            parameter=dict(n=10))))
+        job.start()
+        job.join()
+
+        self.assertEqual(job.result["field"].shape, (10, 20, 30))
+        self.assertEqual(job.result["field"][-1, 0, 0], 9.)
+
+    @skipUnless(os.path.isdir("/dev/shm") and resource is not None,
+                "needs posix shared memory")
+    def test_fd_limit(self):
+        n_open = len(os.listdir("/proc/self/fd"))
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (n_open + 64, hard))
+        try:
+            job = Job(shared_function, Configuration("shared", dict(
+                parameter=dict(n=500, t=0))))
+            job.start()
+            job.join()
+        finally:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (soft, hard))
+
+        self.assertEqual(job.result["field"].shape, (500, 10))
+        self.assertEqual(job.progress_style, "success")
+
+    @skipUnless(os.path.isdir("/dev/shm"), "needs posix shared memory")
+    def test_terminate(self):
+        segments = shared_segments()
+        worker = jt.workers.ProcessWorker()
+        worker.submit(shared_function, Configuration("shared", dict(
+            parameter=dict(n=20, t=60))))
+        time.sleep(1)
+        self.assertEqual(len(shared_segments() - segments), 20)
+
+        worker.terminate()
+        self.assertEqual(shared_segments() - segments, set())
+
+
+class TestWorkerPool(TestCase):
+    def run_jobs(self, pool, n_jobs):
+        pids = list()
+        for i in range(n_jobs):
+            job = Job(pid_function, live_config, worker_pool=pool)
+            job.start()
+            job.join()
+            pids.append(job.result["pid"])
+
+        return pids
+
+    def test_reuse(self):
+        pool = jt.WorkerPool()
+        pool.resize(1)
+        pids = self.run_jobs(pool, 3)
+        pool.shutdown()
+
+        self.assertEqual(len(set(pids)), 1)
+        self.assertNotEqual(pids[0], os.getpid())
+
+    def test_children(self):
+        pool = jt.WorkerPool()
+        pool.resize(1)
+        job = Job(child_function, live_config, worker_pool=pool)
+        job.start()
+        job.join()
+        pool.shutdown()
+
+        self.assertEqual(job.result["exitcode"], 0)
+
+    def test_exit(self):
+        # idle workers do not keep the interpreter alive
+        script = "\n".join([
+            "import juts as jt",
+            "from juts.tests.test_container import pid_function, live_config",
+            "pool = jt.WorkerPool()",
+            "pool.resize(1)",
+            "job = jt.Job(pid_function, live_config, worker_pool=pool)",
+            "job.start()",
+            "job.join()",
+            "print(job.result['pid'])"])
+        output = subprocess.run([sys.executable, "-c", script], timeout=60,
+                                capture_output=True, text=True)
+        self.assertEqual(output.returncode, 0, output.stderr)
+        self.assertTrue(output.stdout.strip().isdigit())
+
+    def test_recycle(self):
+        pool = jt.WorkerPool(max_jobs_per_worker=2)
+        pool.resize(1)
+        pids = self.run_jobs(pool, 4)
+        pool.shutdown()
+
+        self.assertEqual(pids[0], pids[1])
+        self.assertEqual(pids[2], pids[3])
+        self.assertNotEqual(pids[1], pids[2])
+
+
+class TestJobScheduler(TestCase):
+    def test_queue_snapshot(self):
+        scheduler = jt.JobScheduler()
+        jobs = [Job(sleep_function, live_config) for _ in range(20)]
+
+        def churn():
+            for _ in range(200):
+                scheduler.extend_queue_jobs(jobs)
+                # as the scheduler thread dispatches them
+                for _ in jobs:
+                    with scheduler._condition:
+                        scheduler.queue_jobs.pop_next()
+
+        thread = Thread(target=churn)
+        thread.start()
+        while thread.is_alive():
+            for job in scheduler.get_queue_jobs():
+                self.assertIsInstance(job, Job)
+        thread.join()
+
+        # no stale dispatch order was cached by the reads
+        self.assertEqual(scheduler.get_queue_jobs(), list())
+
+    def test_dispatch(self):
+        scheduler = jt.JobScheduler()
+        scheduler.cpu_ids = list(range(4))
+        scheduler.pin_cpus = False
+        scheduler.available_kernels = 4
+        scheduler.start()
+        for i in range(8):
+            scheduler.append_queue_job(Job(sleep_function, Configuration(
+                str(i), dict(parameter=dict(t=.5)))))
+
+        scheduler.start_queue()
+        time.sleep(.1)
+        self.assertEqual(len(scheduler.busy_jobs), 4)
+        self.assertEqual(len(scheduler.queue_jobs), 4)
+
+        while len(scheduler.done_jobs) < 8:
+            time.sleep(.05)
+
+        scheduler.shutdown()
+        self.assertFalse(scheduler.is_alive())
+
+    def test_headless(self):
+        finished = list()
+        scheduler = jt.JobScheduler()
+        scheduler.sync_done.connect(lambda: finished.append(None))
+        scheduler.start()
+        job = Job(live_function, live_config)
+        scheduler.append_queue_job(job)
+        scheduler.start_queue()
+        while not scheduler.done_jobs:
+            time.sleep(.05)
+        scheduler.shutdown()
+
+        self.assertEqual(finished, [None])
+        self.assertEqual(job.progress_value, 100)
+        self.assertIsNone(job._progress)
+        self.assertIsNone(job.log_handler._out)
+        self.assertIn("join process", job.log_handler.lines[-1])
+        self.assertEqual(job.progress.value, 100)
+
+    def test_packing(self):
+        scheduler = jt.JobScheduler()
+        scheduler.cpu_ids = list(range(4))
+        scheduler.pin_cpus = False
+        scheduler.available_kernels = 4
+        scheduler.max_memory = 100
+        scheduler.start()
+
+        jobs = [Job(sleep_function, Configuration(str(i), dict(
+            parameter=dict(t=.5))), n_cpus=n_cpus, memory=memory)
+            for i, (n_cpus, memory) in enumerate(
+                [(3, 0), (2, 0), (1, 80), (1, 80)])]
+        for job in jobs:
+            scheduler.append_queue_job(job)
+
+        scheduler.start_queue()
+        time.sleep(.2)
+        # the 2-cpu job and the second memory heavy job have to wait
+        self.assertEqual(scheduler.busy_jobs, [jobs[0], jobs[2]])
+
+        while len(scheduler.done_jobs) < 4:
+            time.sleep(.05)
+        scheduler.shutdown()
+
+    @skipUnless(hasattr(os, "sched_setaffinity"), "affinity not supported")
+    def test_affinity(self):
+        cpus = sorted(os.sched_getaffinity(0))
+        scheduler = jt.JobScheduler()
+        scheduler.start()
+        jobs = [Job(affinity_function, live_config, n_cpus=len(cpus)),
+                Job(affinity_function, live_config)]
+        for job in jobs:
+            scheduler.append_queue_job(job)
+
+        scheduler.start_queue()
+        while len(scheduler.done_jobs) < 2:
+            time.sleep(.05)
+        scheduler.shutdown()
+
+        self.assertEqual(jobs[0].result["cpus"], cpus)
+        self.assertEqual(jobs[0].result["threads"], str(len(cpus)))
+        self.assertEqual(jobs[1].result["cpus"], cpus[:1])
+        log = "\n".join(jobs[0].log_handler.lines)
+        if jt.transport.threadpoolctl is None:
+            self.assertIn("threadpoolctl is not installed", log)
+
+    def run_limited_job(self, func, t, pool=False, **kwargs):
+        scheduler = jt.JobScheduler(pool=pool)
+        scheduler.cpu_ids = list(range(1))
+        scheduler.pin_cpus = False
+        scheduler.available_kernels = 1
+        scheduler.limit_check_interval = .05
+        scheduler.start()
+        job = Job(func, Configuration("t", dict(parameter=dict(t=t))),
+                  queue_timeout=.05, **kwargs)
+        follower = Job(pid_function, live_config)
+        scheduler.append_queue_job(job)
+        scheduler.append_queue_job(follower)
+
+        t0 = time.time()
+        scheduler.start_queue()
+        while job not in scheduler.done_jobs:
+            time.sleep(.01)
+        duration = time.time() - t0
+        while len(scheduler.done_jobs) < 2:
+            time.sleep(.01)
+        scheduler.shutdown()
+
+        return job, duration
+
+    def assert_terminated(self, job):
+        self.assertTrue(job.cancelled)
+        self.assertEqual(job.progress_style, "danger")
+        pid = job.result["pid"][0]
+        with self.assertRaises(OSError):
+            os.kill(int(pid), 0)
+
+    def test_wall_time_limit(self):
+        job, duration = self.run_limited_job(sleep_function, 30,
+                                             wall_time_limit=.3)
+        self.assertTrue(job.cancelled)
+        self.assertEqual(job.cancel_reason, "wall-clock time limit exceeded")
+        self.assertLess(duration, 5)
+
+    @skipUnless(os.path.exists("/proc/self/stat"), "cpu time not available")
+    def test_cpu_time_limit(self):
+        job, duration = self.run_limited_job(busy_function, 30,
+                                             cpu_time_limit=.3)
+        self.assertEqual(job.cancel_reason, "cpu time limit exceeded")
+        self.assert_terminated(job)
+
+    def test_cancel(self):
+        for func, pool in [(busy_function, False), (stubborn_function, True)]:
+            scheduler = jt.JobScheduler(pool=pool)
+            scheduler.start()
+            job = Job(func, Configuration("t", dict(parameter=dict(t=30))),
+                      queue_timeout=.05)
+            scheduler.append_queue_job(job)
+            queued = Job(sleep_function, live_config)
+            scheduler.append_queue_job(queued)
+            scheduler.cancel_job(queued)
+            self.assertIn(queued, scheduler.done_jobs)
+            self.assertTrue(queued.cancelled)
+
+            scheduler.start_queue()
+            while "pid" not in job.result:
+                time.sleep(.01)
+            scheduler.cancel_job(job)
+            while job not in scheduler.done_jobs:
+                time.sleep(.01)
+            scheduler.shutdown()
+
+            self.assert_terminated(job)
+            if pool:
+                self.assertEqual(scheduler.worker_pool.busy_workers, [])
@@ -0,0 +1,34 @@
+from unittest import TestCase
+import subprocess
+import sys
+import os
+
+
+script = """
+import time
+import numpy
+t_0 = time.perf_counter()
+import juts
+juts.Configuration, juts.Job, juts.JobScheduler, juts.load_configs_from_file
+t_1 = time.perf_counter()
+heavy = ["ipywidgets", "bqplot", "IPython", "matplotlib", "yaml"]
+print(t_1 - t_0, [mod for mod in heavy if mod in sys.modules])
+"""
+
+
+class TestImport(TestCase):
+    def test_import_time(self):
+        # numpy is imported up front, it is needed by every job anyway
+        root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+        output = subprocess.check_output(
+            [sys.executable, "-c", "import sys\n" + script], cwd=root)
+        duration, loaded = output.decode().strip().split(" ", 1)
+
+        self.assertEqual(loaded, "[]")
+        self.assertLess(float(duration), .3)
+
+    def test_lazy_names(self):
+        import juts
+        self.assertIs(juts.Plot, juts.widgets.Plot)
+        with self.assertRaises(AttributeError):
+            juts.not_a_name
@@ -0,0 +1,163 @@
+from unittest import TestCase
+import juts as jt
+import time
+
+
+class Item:
+    def __init__(self, name):
+        self.name = name
+
+
+class TestPagedItemList(TestCase):
+    def setUp(self):
+        self.items = [Item("job {}".format(i)) for i in range(5000)]
+        self.lst = jt.PagedItemList("Jobs", self.items, page_size=50)
+
+    def test_pages(self):
+        self.assertEqual(len(self.lst.select.options), 50)
+        self.assertEqual(self.lst.page_label.value, "1/100 (5000)")
+        self.assertIn("job 4999", self.lst.names)
+
+        # selecting an item shows its page
+        self.lst.index = 1234
+        self.assertEqual(self.lst.page, 24)
+        self.assertEqual(self.lst.select.value, "job 1234")
+        self.lst.select.index = 1
+        self.assertEqual(self.lst.index, 1201)
+
+    def test_filter(self):
+        self.lst.filter_text.value = "99"
+        self.assertEqual(self.lst.page_label.value, "1/2 (95)")
+        self.lst.select.index = 0
+        self.assertEqual(self.lst.get_selected().name, "job 99")
+
+        # a selection which does not match clears the filter
+        self.lst.index = 5
+        self.assertEqual(self.lst.filter_text.value, "")
+        self.assertEqual(self.lst.select.value, "job 5")
+
+    def test_patches(self):
+        self.lst.index = 10
+        item = self.lst.pop_item(3)
+        self.assertNotIn(item.name, self.lst.names)
+        self.assertEqual(self.lst.index, 9)
+        self.lst.insert_items(0, [Item("new 1"), Item("new 2")])
+        self.assertEqual(self.lst.index, 11)
+        self.assertEqual(self.lst.get_selected().name, "job 10")
+        self.assertEqual(self.lst.n_items, 5001)
+
+        self.lst.sync_items(self.items[10:])
+        self.assertEqual(self.lst.index, 0)
+        self.lst.sync_items(self.items[11:])
+        self.assertIsNone(self.lst.index)
+
+    def assert_filter_kept(self):
+        filtered = list(self.lst._filtered)
+        self.lst.update_filter()
+        self.assertEqual(filtered, self.lst._filtered)
+
+    def test_filtered_patches(self):
+        self.lst.filter_text.value = "9"
+        self.lst.pop_item(9)
+        self.assert_filter_kept()
+        self.lst.insert_items(5, [Item("new 9"), Item("new 1")])
+        self.assert_filter_kept()
+
+        removed = {id(it) for it in self.lst.item_list[::7]}
+        self.lst.patch(removed, [(0, Item("new 19")), (4, Item("new 2")),
+                                 (100, Item("new 99")), (None, Item("9"))])
+        self.assert_filter_kept()
+        self.assertEqual(self.lst.get_positions()[0], 0)
+        self.assertEqual(self.lst.get_positions()[-1],
+                         len(self.lst.item_list) - 1)
+
+
+def short_function(config, process_queue=None, return_dict=None):
+    return_dict.update(done=True)
+
+
+class TestSchedulerSync(TestCase):
+    def setUp(self):
+        self.ui = jt.SchedulerInterface()
+        self.scheduler = self.ui.job_scheduler
+        self.config = jt.Configuration("short", dict(parameter=dict(n=1)))
+
+    def tearDown(self):
+        self.scheduler.shutdown()
+
+    def wait_for_sync(self, n_done):
+        t0 = time.time()
+        while (self.ui.result_list.n_items < n_done
+               or self.ui._sync_timer is not None):
+            self.assertLess(time.time() - t0, 30)
+            time.sleep(.01)
+
+    def test_patches(self):
+        jobs = [jt.Job(short_function, self.config, name="job {}".format(i),
+                       priority=i % 3) for i in range(64)]
+        self.scheduler.set_policy(jt.PriorityPolicy())
+        self.scheduler.extend_queue_jobs(jobs)
+        time.sleep(.2)
+        self.assertEqual(self.ui.queue_list.item_list,
+                         list(self.scheduler.queue_jobs))
+
+        renders = list()
+        self.ui.job_view.update_view = lambda job, mode: renders.append(
+            (job, mode))
+        selected = self.ui.queue_list.item_list[-1]
+        self.ui.queue_list.index = 63
+        del renders[:]
+
+        self.scheduler.start_queue()
+        self.wait_for_sync(64)
+
+        self.assertEqual(self.ui.result_list.item_list,
+                         self.scheduler.done_jobs)
+        self.assertEqual(self.ui.queue_list.item_list, list())
+        self.assertEqual(self.ui.busy_list.item_list, list())
+        # the selected job is followed, the view rendered when it moved
+        self.assertIs(self.ui.result_list.get_selected(), selected)
+        self.assertLessEqual(len(renders), 2)
+        self.assertEqual(renders[-1], (selected, "result"))
+
+    def test_change_events(self):
+        changes = list()
+        self.scheduler.job_change.connect(changes.append)
+        job = jt.Job(short_function, self.config)
+        self.scheduler.append_queue_job(job)
+        self.scheduler.start_queue()
+        self.wait_for_sync(1)
+
+        self.assertEqual([(c.kind, c.source, c.target) for c in changes],
+                         [("inserted", "queue", None),
+                          ("moved", "queue", "busy"),
+                          ("moved", "busy", "done")])
+
+    def test_discard(self):
+        jobs = [jt.Job(short_function, self.config, name="job {}".format(i))
+                for i in range(10)]
+        self.scheduler.extend_queue_jobs(jobs)
+        time.sleep(.2)
+        self.ui.queue_list.index = 5
+        # not yet patched into the list, hence the indices differ
+        self.scheduler.extend_queue_jobs([jt.Job(short_function, self.config,
+                                                 priority=1)])
+        self.scheduler.set_policy(jt.PriorityPolicy())
+        self.ui.on_discard_job_bt(None)
+
+        self.assertNotIn(jobs[5], self.scheduler.queue_jobs)
+        self.assertEqual(len(self.scheduler.queue_jobs), 10)
+        self.assertTrue(jobs[5].cancelled)
+        time.sleep(.2)
+        self.assertEqual(self.ui.queue_list.item_list,
+                         list(self.scheduler.queue_jobs))
+
+        self.scheduler.start_queue()
+        self.wait_for_sync(10)
+        self.ui.result_list.index = 0
+        done = self.ui.result_list.get_selected()
+        self.ui.on_discard_job_bt(None)
+        self.assertNotIn(done, self.scheduler.done_jobs)
+        time.sleep(.2)
+        self.assertEqual(self.ui.result_list.item_list,
+                         self.scheduler.done_jobs)
@@ -0,0 +1,249 @@
+from unittest import TestCase
+from unittest.mock import patch
+from tempfile import TemporaryDirectory
+from juts.plotwidgets import MinMaxDecimator, minmax_indices, \
+    chunked_minmax_indices, lttb_indices
+import juts as jt
+import numpy as np
+import time
+
+
+def ramp_function(config, process_queue=None, return_dict=None):
+    for i in range(config["parameter"]["n"]):
+        process_queue.put(dict(time=i, value=2. * i))
+        time.sleep(config["parameter"]["t"])
+
+
+def returning_function(config, process_queue=None, return_dict=None):
+    n = config["parameter"]["n"]
+    for i in range(n):
+        process_queue.put(dict(time=i, value=float(i)))
+    time.sleep(config["parameter"]["t"])
+    return_dict.update(time=np.arange(n), value=-np.arange(n, dtype=float))
+
+
+class TestSeriesMatrix(TestCase):
+    def test_update(self):
+        matrix = jt.SeriesMatrix(2)
+        matrix.update(0, np.arange(3.))
+        self.assertTrue(matrix.changed)
+        np.testing.assert_array_equal(matrix.get_view(), [[0, 1, 2]] + [
+            [np.nan] * 3])
+        self.assertFalse(matrix.changed)
+
+        # only the tail is copied, the rendered view stays unchanged
+        series = np.arange(200.)
+        view = matrix.get_view()
+        series[:3] = -1
+        matrix.update(0, series)
+        matrix.update(1, series[:5])
+        self.assertEqual(matrix.lengths, [200, 5])
+        self.assertEqual(matrix.get_view().shape, (2, 200))
+        np.testing.assert_array_equal(matrix.get_view()[0, :4], [0, 1, 2, 3])
+        np.testing.assert_array_equal(view[0], [0, 1, 2])
+
+        matrix.update(0, series)
+        self.assertFalse(matrix.changed)
+
+        np.testing.assert_array_equal(matrix.get_view(2),
+                                      [[198, 199], [3, 4]])
+
+        # changed samples are only copied after the row is reset
+        matrix.reset_row(0)
+        matrix.update(0, series)
+        np.testing.assert_array_equal(matrix.get_view()[0, :4],
+                                      [-1, -1, -1, 3])
+
+    def test_reset(self):
+        matrix = jt.SeriesMatrix(1)
+        matrix.update(0, np.arange(5.))
+        matrix.update(0, np.arange(2.) + 10)
+        np.testing.assert_array_equal(matrix.get_view(), [[10, 11]])
+
+
+class TestDecimation(TestCase):
+    def test_minmax(self):
+        y = np.sin(np.linspace(0, 20, 10 ** 5))
+        y[12345] = 5
+        indices = minmax_indices(y, 100)
+        self.assertLessEqual(len(indices), 200)
+        self.assertIn(12345, indices)
+        self.assertTrue(np.all(np.diff(indices) > 0))
+        self.assertEqual(y[indices].min(), y.min())
+
+    def test_chunked(self):
+        y = np.random.RandomState(0).randn(10 ** 5)
+        np.testing.assert_array_equal(
+            chunked_minmax_indices(y, 100, chunk_size=3000),
+            minmax_indices(y, 100))
+        np.testing.assert_array_equal(
+            chunked_minmax_indices(y, 100, 5000, 60000, chunk_size=3000),
+            5000 + minmax_indices(y[5000:60000], 100))
+
+    def test_incremental(self):
+        y = np.random.RandomState(0).randn(10 ** 5)
+        decimator = MinMaxDecimator(100)
+        for stop in range(0, len(y) + 1, 997):
+            decimator.update(y[:stop])
+            indices = decimator.get_indices(y[:stop])
+            self.assertLessEqual(len(decimator.extrema), 100)
+            if stop:
+                self.assertEqual(y[indices].max(), y[:stop].max())
+                self.assertEqual(y[indices].min(), y[:stop].min())
+
+        # the same buckets as at once
+        once = MinMaxDecimator(100)
+        once.update(y[:stop])
+        self.assertEqual(once.bucket_size, decimator.bucket_size)
+        np.testing.assert_array_equal(once.get_indices(y[:stop]), indices)
+
+    def test_lttb(self):
+        x = np.linspace(0, 10, 10 ** 4)
+        y = np.zeros_like(x)
+        y[5000] = 1
+        indices = lttb_indices(x, y, 50)
+        self.assertEqual(len(indices), 50)
+        self.assertEqual(indices[0], 0)
+        self.assertEqual(indices[-1], len(x) - 1)
+        self.assertIn(5000, indices)
+
+
+class TestTimeSeriesPlot(TestCase):
+    def test_live_update(self):
+        job = jt.Job(ramp_function, jt.Configuration(
+            "ramp", dict(parameter=dict(n=30, t=.01))))
+        plot = jt.TimeSeriesPlot([job])
+        plot.update_cycle = .02
+        job.start()
+        plot.start()
+        job.join()
+        plot.join()
+
+        mark = plot.figures["value"].marks[0]
+        np.testing.assert_array_equal(np.asarray(mark.x).ravel(),
+                                      np.arange(30))
+        np.testing.assert_array_equal(np.asarray(mark.y).ravel(),
+                                      2. * np.arange(30))
+
+    def test_zoom(self):
+        job = jt.Job(ramp_function, jt.Configuration(
+            "ramp", dict(parameter=dict(n=5000, t=0))))
+        job.start()
+        job.join()
+        plot = jt.TimeSeriesPlot([job], n_pixels=100)
+
+        mark = plot.figures["value"].marks[0]
+        self.assertLessEqual(np.asarray(mark.x).size, 200)
+
+        # zoomed in, all samples of the range
+        plot.x_scales["value"].min = 1000
+        plot.x_scales["value"].max = 1100
+        np.testing.assert_array_equal(np.asarray(mark.x).ravel(),
+                                      np.arange(999, 1102))
+
+    def test_final_result(self):
+        job = jt.Job(returning_function, jt.Configuration(
+            "return", dict(parameter=dict(n=100, t=.5))), queue_timeout=.05)
+        job.start()
+        while len(job.result.get("value", [])) < 100:
+            time.sleep(.01)
+        plot = jt.TimeSeriesPlot([job])
+        mark = plot.figures["value"].marks[0]
+        np.testing.assert_array_equal(np.asarray(mark.y).ravel(),
+                                      np.arange(100))
+
+        # the returned result replaces the live samples
+        job.join()
+        plot.update_plot()
+        np.testing.assert_array_equal(np.asarray(mark.y).ravel(),
+                                      -np.arange(100))
+
+    def test_stored_result(self):
+        job = jt.Job(ramp_function, jt.Configuration(
+            "ramp", dict(parameter=dict(n=20000, t=0))))
+        job.start()
+        job.join()
+        with TemporaryDirectory() as directory:
+            store = jt.ResultStore(directory, chunk_bytes=2 ** 12)
+            stored = jt.StoredJob(store.save(job))
+            self.assertIsInstance(stored.result["value"], jt.StoredArray)
+
+            # decimated chunk by chunk, the results are never loaded at once
+            with patch.object(jt.StoredArray, "__array__",
+                              side_effect=AssertionError("loaded")):
+                plot = jt.TimeSeriesReplayPlot([stored], n_pixels=100)
+                mark = plot.figures["value"].marks[0]
+                self.assertLessEqual(np.asarray(mark.y).size, 200)
+                self.assertEqual(np.max(mark.y), 2. * 19999)
+                self.assertEqual(plot.series["value"][1].lengths, [0])
+
+                plot.x_scales["value"].min = 1000
+                plot.x_scales["value"].max = 1100
+                np.testing.assert_array_equal(np.asarray(mark.x).ravel(),
+                                              np.arange(999, 1102))
+                plot.on_no_jobs_alive()
+                self.assertEqual(plot.replay_panel.time_step, 1.)
+
+    def test_schema_version(self):
+        job = jt.Job(ramp_function, jt.Configuration(
+            "ramp", dict(parameter=dict(n=10, t=0))))
+        job.start()
+        job.join()
+        plot = jt.TimeSeriesPlot([job])
+        figure = plot.figures["value"]
+
+        scanned = list()
+        plot.is_timeseries = lambda result: scanned.append(result) or True
+        plot.update_plot()
+        self.assertEqual(scanned, [])
+        self.assertIs(plot.figures["value"], figure)
+
+        job.schema_version += 1
+        plot.update_plot()
+        self.assertEqual(len(scanned), 1)
+        self.assertIs(plot.figures["value"], figure)
+
+
+class CountingPlot(jt.Plot):
+    def __init__(self, jobs):
+        super().__init__(jobs, jt.PlotView(), update_cycle=.01)
+        self.n_updates = 0
+
+    def update_plot(self, *args, **kwargs):
+        self.n_updates += 1
+
+
+class TestRenderLoop(TestCase):
+    def test_shared_loop(self):
+        jobs = [jt.Job(ramp_function, jt.Configuration(
+            "ramp", dict(parameter=dict(n=50, t=.005)))) for _ in range(2)]
+        plots = [CountingPlot(jobs) for _ in range(10)]
+        hidden = CountingPlot(jobs)
+        hidden.set_visible(False)
+        for plot in plots + [hidden]:
+            plot.start()
+        for job in jobs:
+            job.start()
+        for job in jobs:
+            job.join()
+        for plot in plots + [hidden]:
+            plot.join(10)
+            self.assertFalse(plot.is_alive())
+
+        self.assertTrue(all(plot.render_loop is hidden.render_loop
+                            for plot in plots))
+        # coalesced, less frames than live updates
+        updates = sum(job.live_result_update.count for job in jobs)
+        self.assertTrue(all(1 <= plot.n_updates < updates
+                            for plot in plots))
+        # only the final frame
+        self.assertEqual(hidden.n_updates, 1)
+
+    def test_frame_budget(self):
+        job = jt.Job(ramp_function, jt.Configuration(
+            "ramp", dict(parameter=dict(n=1, t=0))))
+        plot = CountingPlot([job])
+        plot.frame_duration = .1
+        self.assertGreaterEqual(
+            plot.render_loop.get_frame_interval(plot),
+            .1 / jt.RenderLoop.max_load)
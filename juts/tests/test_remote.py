@@ -0,0 +1,93 @@
+from unittest import TestCase
+from multiprocessing import Process
+import juts as jt
+import numpy as np
+import time
+import os
+
+
+authkey = b"juts test"
+
+
+def remote_function(config, process_queue=None, return_dict=None):
+    for i in range(config["parameter"]["n"]):
+        process_queue.put(dict(progress=i, time=i,
+                               field=jt.share_array(np.full(3, float(i)))))
+        time.sleep(config["parameter"]["t"])
+    return_dict.update(pid=os.getppid())
+
+
+def run_agent(address, n_cpus):
+    jt.WorkerAgent(address, authkey, n_cpus).run()
+
+
+class TestRemote(TestCase):
+    def setUp(self):
+        self.scheduler = jt.JobScheduler()
+        # no local capacity, everything runs on the agents
+        self.scheduler.cpu_ids = list()
+        self.scheduler.start()
+        self.server = jt.AgentServer(self.scheduler, authkey)
+        self.agents = [Process(target=run_agent,
+                               args=(self.server.address, 2))
+                       for _ in range(2)]
+        for agent in self.agents:
+            agent.start()
+        while len(self.scheduler.agents) < 2:
+            time.sleep(.01)
+
+    def tearDown(self):
+        self.server.close()
+        self.scheduler.shutdown()
+        for agent in self.agents:
+            agent.join(5)
+            if agent.is_alive():
+                agent.kill()
+
+    def queue_jobs(self, n_jobs, t):
+        jobs = [jt.Job(remote_function, jt.Configuration(
+            str(i), dict(parameter=dict(n=20, t=t))), queue_timeout=.05)
+            for i in range(n_jobs)]
+        self.scheduler.extend_queue_jobs(jobs)
+        self.scheduler.start_queue()
+
+        return jobs
+
+    def wait_for(self, jobs):
+        t0 = time.time()
+        while len(self.scheduler.done_jobs) < len(jobs):
+            self.assertLess(time.time() - t0, 30)
+            time.sleep(.01)
+
+    def test_run(self):
+        jobs = self.queue_jobs(6, .01)
+        time.sleep(.1)
+        self.assertEqual(len(self.scheduler.busy_jobs), 4)
+        self.wait_for(jobs)
+
+        agent_pids = {agent.pid for agent in self.agents}
+        self.assertEqual({job.result["pid"] for job in jobs}, agent_pids)
+        job = jobs[0]
+        self.assertEqual(job.progress_value, 100)
+        self.assertEqual(len(job._live_result), 0)
+
+    def test_live_results(self):
+        job, = self.queue_jobs(1, .05)
+        while len(job.result.get("field", [])) < 5:
+            time.sleep(.01)
+        np.testing.assert_array_equal(job.result["field"][4], np.full(3, 4.))
+        self.wait_for([job])
+
+    def test_disconnect(self):
+        jobs = self.queue_jobs(4, .1)
+        while len(self.scheduler.busy_jobs) < 4:
+            time.sleep(.01)
+        self.agents[0].kill()
+        self.wait_for(jobs)
+
+        self.assertEqual(len(self.scheduler.agents), 1)
+        self.assertEqual({job.result["pid"] for job in jobs},
+                         {self.agents[1].pid})
+        requeued = [job for job in jobs if "worker lost, requeue job"
+                    in "\n".join(job.log_handler.lines)]
+        self.assertEqual(len(requeued), 2)
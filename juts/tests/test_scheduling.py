@@ -0,0 +1,60 @@
+from unittest import TestCase
+from juts import (Configuration, Job, JobQueue, PriorityPolicy,
+                  ShortestFirstPolicy, FairSharePolicy)
+
+
+def function(config, process_queue=None, return_dict=None):
+    pass
+
+
+config = Configuration("config", dict())
+
+
+def make_job(name, **kwargs):
+    return Job(function, config, name=name, **kwargs)
+
+
+def drain(queue):
+    return [queue.pop_next().name for i in range(len(queue))]
+
+
+class TestJobQueue(TestCase):
+    def test_fifo(self):
+        queue = JobQueue()
+        queue.extend([make_job(str(i)) for i in range(5)])
+        queue.pop(1)
+        self.assertEqual([job.name for job in queue], ["0", "2", "3", "4"])
+        self.assertEqual(drain(queue), ["0", "2", "3", "4"])
+
+    def test_priority(self):
+        queue = JobQueue(PriorityPolicy())
+        queue.append(make_job("sweep_1"))
+        queue.append(make_job("validation", priority=10))
+        queue.append(make_job("sweep_2"))
+        self.assertEqual(queue[0].name, "validation")
+        self.assertEqual(drain(queue), ["validation", "sweep_1", "sweep_2"])
+
+    def test_shortest_first(self):
+        queue = JobQueue(ShortestFirstPolicy())
+        queue.append(make_job("unknown"))
+        queue.append(make_job("long", expected_runtime=100))
+        queue.append(make_job("short", expected_runtime=1))
+        self.assertEqual(drain(queue), ["short", "long", "unknown"])
+
+    def test_fair_share(self):
+        queue = JobQueue(FairSharePolicy())
+        queue.extend([make_job("a{}".format(i), group="a") for i in range(3)])
+        queue.extend([make_job("b{}".format(i), group="b") for i in range(2)])
+        self.assertEqual(queue.pop_next().name, "a0")
+        self.assertEqual(queue.pop_next().name, "b0")
+        queue.append(make_job("c0", group="c"))
+        self.assertEqual(drain(queue), ["c0", "a1", "b1", "a2"])
+
+    def test_remove(self):
+        queue = JobQueue(PriorityPolicy())
+        jobs = [make_job(str(i), priority=i) for i in range(4)]
+        queue.extend(jobs)
+        queue.remove(jobs[3])
+        self.assertNotIn(jobs[3], queue)
+        self.assertEqual(len(queue), 3)
+        self.assertEqual(drain(queue), ["2", "1", "0"])
@@ -0,0 +1,94 @@
+from unittest import TestCase
+from tempfile import TemporaryDirectory
+import juts as jt
+import numpy as np
+import time
+import os
+
+
+def store_function(config, process_queue=None, return_dict=None):
+    for i in range(config["parameter"]["n"]):
+        process_queue.put(dict(time=i * .1, series=[i, -i], label=str(i)))
+
+
+store_config = jt.Configuration("store", dict(parameter=dict(n=1000)))
+
+
+class TestResultStore(TestCase):
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.job = jt.Job(store_function, store_config)
+        self.job.start()
+        self.job.join()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip(self):
+        # small chunks, hence the results are split into several files
+        store = jt.ResultStore(self.tmp.name, chunk_bytes=1000)
+        directory = store.save(self.job)
+        self.assertEqual(store.list_jobs(), [directory.split("/")[-1]])
+
+        stored = store.load_all()[0]
+        self.assertEqual(stored.name, self.job.name)
+        self.assertEqual(stored.func.__name__, "store_function")
+        self.assertEqual(stored.config.name, "store")
+        self.assertEqual(stored.log_handler.lines, self.job.log_handler.lines)
+        self.assertEqual(list(stored.result), list(self.job.result))
+
+        time = stored.result["time"]
+        self.assertIsInstance(time, jt.StoredArray)
+        self.assertGreater(len(time.chunk_files), 1)
+        np.testing.assert_array_equal(time, self.job.result["time"])
+        np.testing.assert_array_equal(time[-300:], self.job.result["time"][-300:])
+        np.testing.assert_array_equal(time[5:900:7], self.job.result["time"][5:900:7])
+        np.testing.assert_array_equal(time[::-3], self.job.result["time"][::-3])
+        self.assertEqual(time[-1], self.job.result["time"][-1])
+        np.testing.assert_array_equal(stored.result["series"][:, 1],
+                                      self.job.result["series"][:, 1])
+        self.assertEqual(list(stored.result["label"]),
+                         list(self.job.result["label"]))
+
+    def test_memory_map(self):
+        store = jt.ResultStore(self.tmp.name)
+        stored = jt.StoredJob(store.save(self.job))
+        self.assertIsInstance(stored.result["series"], np.memmap)
+        self.assertEqual(stored.result["series"].shape, (1000, 2))
+
+    def test_compress(self):
+        store = jt.ResultStore(self.tmp.name, chunk_bytes=1000, compress=True)
+        stored = jt.StoredJob(store.save(self.job))
+        np.testing.assert_array_equal(stored.result["series"],
+                                      self.job.result["series"])
+
+
+class TestLoadResults(TestCase):
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.ui = jt.SchedulerInterface()
+        self.ui.result_store = jt.ResultStore(self.tmp.name)
+        job = jt.Job(store_function, store_config)
+        job.start()
+        job.join()
+        self.directory = self.ui.result_store.save(job)
+
+    def tearDown(self):
+        self.ui.job_scheduler.shutdown()
+        self.tmp.cleanup()
+
+    def test_load_discard(self):
+        self.ui.load_results()
+        self.ui.load_results()
+        self.assertEqual(len(self.ui.job_scheduler.done_jobs), 1)
+        stored = self.ui.job_scheduler.done_jobs[0]
+        self.assertIsInstance(stored, jt.StoredJob)
+        self.assertEqual(self.ui.result_list.item_list, [stored])
+
+        self.ui.result_list.index = 0
+        self.ui.on_discard_job_bt(None)
+        self.assertEqual(self.ui.job_scheduler.done_jobs, [])
+        time.sleep(.2)
+        self.assertEqual(self.ui.result_list.item_list, [])
+        self.assertTrue(os.path.exists(os.path.join(self.directory,
+                                                    "log.txt")))
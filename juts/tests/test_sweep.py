@@ -0,0 +1,97 @@
+from unittest import TestCase
+from tempfile import TemporaryDirectory
+from collections import OrderedDict
+import juts as jt
+import numpy as np
+import os
+
+
+def gain_function(config, process_queue=None, return_dict=None):
+    return_dict.update(config["controller"])
+
+
+base_settings = OrderedDict(controller=OrderedDict(kp=1., kd=.1, mode="pd"))
+
+
+class TestSweep(TestCase):
+    def test_product(self):
+        sweep = jt.Sweep({"controller.kp": [1, 2, 3],
+                          "controller.kd": [.1, .2]})
+        config = jt.Configuration("gains", base_settings, sweep)
+        self.assertEqual(len(sweep), 6)
+
+        configs = list(config.expand())
+        self.assertEqual([c.name for c in configs[:2]],
+                         ["gains[0]", "gains[1]"])
+        self.assertEqual([(c["controller"]["kp"], c["controller"]["kd"])
+                          for c in configs],
+                         [(1, .1), (1, .2), (2, .1), (2, .2), (3, .1), (3, .2)])
+        self.assertEqual(configs[-1]["controller"]["mode"], "pd")
+        # the base configuration is not modified
+        self.assertEqual(config["controller"]["kp"], 1.)
+
+    def test_zip(self):
+        sweep = jt.Sweep({"controller.kp": [1, 2], "controller.kd": [3, 4]},
+                         mode="zip")
+        self.assertEqual(sweep.get_values(-1), [2, 4])
+        with self.assertRaises(ValueError):
+            jt.Sweep({"controller.kp": [1, 2], "controller.kd": [3]},
+                     mode="zip")
+
+    def test_sampling(self):
+        for mode in ["random", "latin"]:
+            sweep = jt.Sweep({"controller.kp": [0, 10],
+                              "controller.kd": [-1, 1]},
+                             mode=mode, n_samples=50, seed=1)
+            samples = np.array([sweep.get_values(i) for i in range(50)])
+            self.assertTrue(np.all(samples[:, 0] >= 0)
+                            and np.all(samples[:, 0] < 10))
+            self.assertTrue(np.all(samples[:, 1] >= -1)
+                            and np.all(samples[:, 1] < 1))
+
+        # every stratum is sampled once
+        strata = np.floor(samples[:, 0] / 10 * 50)
+        self.assertEqual(sorted(strata), list(range(50)))
+
+    def test_yaml(self):
+        sweep = jt.Sweep({"controller.kp": [0, 10]}, mode="latin",
+                         n_samples=5000, seed=3)
+        config = jt.Configuration("gains", base_settings, sweep)
+        with TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, "sweep.yml")
+            jt.dump_configurations(filename, [config])
+            loaded, = jt.load_configs_from_file(filename)
+
+        self.assertEqual(len(loaded.sweep), 5000)
+        self.assertNotIn("sweep", loaded.settings)
+        self.assertEqual(loaded.sweep.get_values(17), sweep.get_values(17))
+
+    def test_bulk_queue(self):
+        sweep = jt.Sweep({"controller.kp": list(range(100)),
+                          "controller.kd": list(range(50))})
+        config = jt.Configuration("gains", base_settings, sweep)
+        scheduler = jt.JobScheduler()
+        calls = list()
+        scheduler.sync_queue.connect(lambda: calls.append(None))
+        scheduler.extend_queue_jobs(jt.sweep_jobs(gain_function, config))
+
+        self.assertEqual(len(scheduler.queue_jobs), 5000)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(scheduler.queue_jobs[4999].name,
+                         "gain_function + gains[4999]")
+        self.assertEqual(scheduler.queue_jobs[0].group, "gains")
+
+    def test_scheduling_kwargs(self):
+        config = jt.Configuration("gains", base_settings, jt.Sweep(
+            {"controller.kp": [1., 2.]}))
+        job = jt.Job(gain_function, config, priority=2, expected_runtime=5.,
+                     n_cpus=2, memory=2 ** 20, wall_time_limit=60.,
+                     cpu_time_limit=30.)
+        kwargs = job.get_scheduling_kwargs()
+        jobs = list(jt.sweep_jobs(gain_function, config, **kwargs))
+
+        # the jobs of the sweep form a group, if the job is in none
+        kwargs["group"] = "gains"
+        self.assertEqual(len(jobs), 2)
+        for sweep_job in jobs:
+            self.assertEqual(sweep_job.get_scheduling_kwargs(), kwargs)
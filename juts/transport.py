@@ -0,0 +1,385 @@
+from multiprocessing import shared_memory, resource_tracker
+from contextlib import contextmanager
+from inspect import signature
+from threading import RLock, Thread, Event
+import numpy as np
+import logging
+import time
+import sys
+import io
+import os
+
+try:
+    import threadpoolctl
+except ImportError:
+    threadpoolctl = None
+
+
+# held while the resource tracker is used and while worker processes are
+# forked, hence no worker inherits the lock of the tracker in locked state
+fork_lock = RLock()
+
+
+class SharedArray:
+    """
+    Small, picklable handle on a numpy array which was placed in a shared
+    memory segment by :py:func:`share_array`. Only the handle travels
+    through the process queue, the job copies the array out of the segment
+    and unlinks it right away.
+    """
+    def __init__(self, name, shape, dtype):
+        self.name = name
+        self.shape = tuple(shape)
+        self.dtype = dtype
+
+    def __repr__(self):
+        return "SharedArray({}, shape={}, dtype={})".format(
+            self.name, self.shape, self.dtype)
+
+    def attach(self):
+        with fork_lock:
+            segment = shared_memory.SharedMemory(name=self.name)
+        array = np.ndarray(self.shape, self.dtype, buffer=segment.buf)
+
+        return segment, array
+
+    def load(self):
+        """
+        Copy the array out of the segment and unlink the segment.
+        """
+        segment, array = self.attach()
+        copy = array.copy()
+        del array
+        release_segment(segment)
+
+        return copy
+
+    def release(self):
+        """
+        Unlink the segment without reading it.
+        """
+        try:
+            with fork_lock:
+                segment = shared_memory.SharedMemory(name=self.name)
+
+        except FileNotFoundError:
+            return
+
+        release_segment(segment)
+
+
+def share_array(array):
+    """
+    Copy `array` into a new shared memory segment and return a
+    :py:class:`SharedArray` handle, which can be sent through the
+    `process_queue` of a job function instead of the array itself::
+
+        process_queue.put(dict(time=t, field=share_array(field)))
+
+    The job which receives the handle takes over the segment and unlinks
+    it as soon as the array is copied out.
+    """
+    array = np.ascontiguousarray(array)
+    segment = create_segment(max(array.nbytes, 1))
+    np.ndarray(array.shape, array.dtype, buffer=segment.buf)[...] = array
+    handle = SharedArray(segment.name, array.shape, array.dtype.str)
+    segment.close()
+
+    return handle
+
+
+def create_segment(size):
+    try:
+        return shared_memory.SharedMemory(create=True, size=size, track=False)
+
+    except TypeError:
+        # python < 3.13: the segment is owned by the receiving job, hence
+        # the resource tracker of the worker must not unlink it on exit
+        segment = shared_memory.SharedMemory(create=True, size=size)
+        resource_tracker.unregister(segment._name, "shared_memory")
+
+        return segment
+
+
+def release_segment(segment):
+    try:
+        segment.close()
+
+    except BufferError:
+        # views are still referenced, the mapping is released with them
+        pass
+
+    try:
+        with fork_lock:
+            segment.unlink()
+
+    except FileNotFoundError:
+        pass
+
+
+def release_shared_arrays(status):
+    """
+    Unlink the segments of the :py:class:`SharedArray` values of a status
+    which is dropped instead of being received by a job.
+    """
+    if not isinstance(status, dict):
+        return
+
+    for value in status.values():
+        if isinstance(value, SharedArray):
+            value.release()
+
+
+class JobReturn:
+    """
+    Final `return_dict` of a job function. It is sent once, in bulk, through
+    the process queue after the function returned (`completed`) or raised.
+    """
+    def __init__(self, return_dict, completed=True):
+        self.return_dict = dict(return_dict)
+        self.completed = completed
+
+
+class Checkpoint:
+    """
+    State of a job function, sent through the process queue by
+    :py:meth:`Checkpointer.save`.
+    """
+    def __init__(self, state):
+        self.state = state
+
+
+class Checkpointer:
+    """
+    Passed to job functions which take a `checkpoint` argument::
+
+        def func(config, process_queue=None, return_dict=None,
+                 checkpoint=None):
+            step = 0 if checkpoint.state is None else checkpoint.state
+            for i in range(step, n):
+                process_queue.put(dict(time=i))
+                if i % 100 == 0:
+                    checkpoint.save(i + 1)
+
+    The state is persisted together with the live results received before
+    it. If the job is queued again, it resumes with the live results and
+    `state` of its last checkpoint. The state has to be picklable.
+    """
+    def __init__(self, process_queue, state=None):
+        self.process_queue = process_queue
+        self.state = state
+
+    def save(self, state):
+        self.state = state
+        self.process_queue.put(Checkpoint(state))
+
+
+class LogLines:
+    """
+    Batch of log lines of the worker process, `(created, levelno, text)`,
+    sent through the process queue by :py:class:`LogForwarder`.
+    `n_dropped` lines were dropped by its rate limit.
+    """
+    def __init__(self, lines, n_dropped=0):
+        self.lines = lines
+        self.n_dropped = n_dropped
+
+
+class LogForwarder(logging.Handler):
+    """
+    Collects the log records and the lines written to stdout and stderr in
+    the worker process while a job function runs and sends them to the job
+    in one :py:class:`LogLines` batch every `interval` seconds. Lines beyond
+    `max_rate` per second, except errors, are only counted, hence printing
+    never blocks the function on the process queue.
+    """
+    def __init__(self, process_queue, interval=.2, max_rate=1000,
+                 level=logging.INFO):
+        super().__init__(level)
+        self.setFormatter(logging.Formatter("%(name)s: %(message)s"))
+        self.process_queue = process_queue
+        self.interval = interval
+        self.max_lines = max(1, int(max_rate * interval))
+        self.buffer = list()
+        self.n_dropped = 0
+        self._stopped = Event()
+        self._saved = None
+
+    def __enter__(self):
+        root = logging.getLogger()
+        self._saved = (root.level, sys.stdout, sys.stderr)
+        if root.level > self.level or root.level == logging.NOTSET:
+            root.setLevel(self.level)
+        root.addHandler(self)
+        sys.stdout = LogStream(self, "stdout", logging.INFO)
+        sys.stderr = LogStream(self, "stderr", logging.WARNING)
+
+        self._stopped.clear()
+        self.thread = Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+        return self
+
+    def __exit__(self, *args):
+        root = logging.getLogger()
+        root.removeHandler(self)
+        sys.stdout.close()
+        sys.stderr.close()
+        root.level, sys.stdout, sys.stderr = self._saved
+
+        self._stopped.set()
+        self.thread.join()
+        self.flush()
+
+    def emit(self, record):
+        try:
+            self.add_line(record.created, record.levelno, self.format(record))
+
+        except Exception:
+            self.handleError(record)
+
+    def add_line(self, created, levelno, text):
+        with self.lock:
+            # errors pass the rate limit
+            if len(self.buffer) < self.max_lines or levelno >= logging.ERROR:
+                self.buffer.append((created, levelno, text))
+            else:
+                self.n_dropped += 1
+
+    def flush(self):
+        with self.lock:
+            lines, self.buffer = self.buffer, list()
+            n_dropped, self.n_dropped = self.n_dropped, 0
+
+        if lines or n_dropped:
+            self.process_queue.put(LogLines(lines, n_dropped))
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            self.flush()
+
+
+class LogStream(io.TextIOBase):
+    """
+    Replaces stdout or stderr in the worker, every complete line is passed
+    on to a :py:class:`LogForwarder`.
+    """
+    def __init__(self, forwarder, name, levelno):
+        super().__init__()
+        self.forwarder = forwarder
+        self.name = name
+        self.levelno = levelno
+        self._partial = ""
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        lines = (self._partial + text).split("\n")
+        self._partial = lines.pop()
+        created = time.time()
+        for line in lines:
+            self.forwarder.add_line(created, self.levelno,
+                                    "{}: {}".format(self.name, line))
+
+        return len(text)
+
+    def close(self):
+        if self._partial:
+            self.write("\n")
+        super().close()
+
+
+def takes_checkpoint(func):
+    try:
+        parameters = signature(func).parameters
+
+    except (TypeError, ValueError):
+        return False
+
+    return "checkpoint" in parameters
+
+
+def run_job(func, config, process_queue, cpus=None, resume_state=None):
+    """
+    Entry point of the worker process. The job function writes its results
+    into a plain, process local `return_dict`, which is transferred to the
+    job when the function returns (or raises). If `cpus` are given, the
+    process is pinned to them while the function runs. Functions with a
+    `checkpoint` argument get a :py:class:`Checkpointer`, initialized with
+    `resume_state`. Log records and prints of the function are forwarded to
+    the job log by a :py:class:`LogForwarder`.
+    """
+    return_dict = dict()
+    kwargs = dict()
+    if takes_checkpoint(func):
+        kwargs["checkpoint"] = Checkpointer(process_queue, resume_state)
+
+    completed = False
+    try:
+        with LogForwarder(process_queue), pinned_to_cpus(cpus):
+            try:
+                func(config, return_dict=return_dict,
+                     process_queue=process_queue, **kwargs)
+
+            except Exception:
+                logging.getLogger("juts.worker").exception(
+                    "job function raised")
+                raise
+        completed = True
+
+    finally:
+        process_queue.put(JobReturn(return_dict, completed))
+
+
+thread_limit_variables = ["OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS",
+                          "MKL_NUM_THREADS", "BLIS_NUM_THREADS",
+                          "VECLIB_MAXIMUM_THREADS", "NUMEXPR_NUM_THREADS"]
+
+
+@contextmanager
+def pinned_to_cpus(cpus):
+    """
+    Pin the current process to `cpus` and limit the thread pools of BLAS
+    and OpenMP to as many threads. The environment variables only affect
+    libraries which are initialized later (and subprocesses), the pools of
+    already loaded libraries are limited through threadpoolctl. Without
+    threadpoolctl, libraries which the job function imported before are
+    not limited, which is logged as a warning.
+    """
+    if not cpus:
+        yield
+        return
+
+    n_threads = str(len(cpus))
+    environment = {var: os.environ.get(var) for var in thread_limit_variables}
+    os.environ.update({var: n_threads for var in thread_limit_variables})
+
+    affinity = None
+    if hasattr(os, "sched_setaffinity"):
+        affinity = os.sched_getaffinity(0)
+        os.sched_setaffinity(0, cpus)
+
+    limits = None
+    if threadpoolctl is not None:
+        limits = threadpoolctl.threadpool_limits(len(cpus))
+    else:
+        logging.getLogger("juts.worker").warning(
+            "threadpoolctl is not installed, the thread pools of loaded "
+            "libraries are not limited to {} threads".format(n_threads))
+
+    try:
+        yield
+
+    finally:
+        if limits is not None:
+            limits.restore_original_limits()
+
+        if affinity is not None:
+            os.sched_setaffinity(0, affinity)
+
+        for var, value in environment.items():
+            if value is None:
+                os.environ.pop(var, None)
+            else:
+                os.environ[var] = value
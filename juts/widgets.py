@@ -2,15 +2,36 @@ import warnings
 
 from .container import Configuration, Job, dump_configurations
 from abc import abstractmethod, ABCMeta
-from threading import Thread, Event
-from collections import OrderedDict
+from threading import Thread, Event, Condition
+from collections import OrderedDict, Counter
+from bisect import bisect_left
 from ast import literal_eval
 from threading import Timer
 import ipywidgets as iw
+import traitlets
 import numpy as np
+import traceback
 import time
 
 
+class Signal(iw.ValueWidget):
+    def __init__(self):
+        super().__init__(value=0)
+
+    def __call__(self, index=None):
+        if index is None:
+            self.value += 1
+
+        else:
+            self.value -= index + 1
+
+    @staticmethod
+    def as_index(change):
+        value = change["new"] - change["old"]
+        if value < 0:
+            return abs(value) - 1
+
+
 class ConfigurationView(iw.Accordion):
     def __init__(self, config=None):
         super().__init__(children=[])
@@ -66,7 +87,7 @@ class ConfigurationView(iw.Accordion):
         else:
             config_name = self.config.name
 
-        return Configuration(config_name, settings)
+        return Configuration(config_name, settings, self.config.sweep)
 
 
 class ResultView(iw.Accordion):
@@ -208,7 +229,8 @@ class JobView(iw.VBox):
         func = self.job.func
         config = self.get_config()
 
-        return Job(func, config, name=self.text.value)
+        return Job(func, config, name=self.text.value,
+                   **self.job.get_scheduling_kwargs())
 
     # TODO: move to separate class to avoid code doubling
     def raise_icon(self, valid, text, hold=False, t_show=5):
@@ -254,9 +276,15 @@ class PlotView(iw.VBox):
             else:
                 widget = iw.Accordion([plot.widget])
                 widget.set_title(0, PlotList.get_item_str(plot))
+                widget.observe(lambda change, plot=plot: plot.set_visible(
+                    change["new"] == 0), names="selected_index")
                 self.plots[plot] = widget
                 children.append(widget)
 
+        # only the expanded plots in the view are rendered
+        for plot, widget in self.plots.items():
+            plot.set_visible(plot in plots and widget.selected_index == 0)
+
         self.children[1].children = tuple(children)
         if len(children) == 0:
             self.label.layout.visibility = "hidden"
@@ -351,6 +379,18 @@ class ItemList(iw.VBox):
             self.valid_timer = Timer(t_show, hide).start()
 
 
+class ConfigList(ItemList):
+    def __init__(self, label, configs, **kwargs):
+        super().__init__(label, configs, "select", **kwargs)
+
+    @staticmethod
+    def get_item_str(it):
+        if it.sweep is None:
+            return it.name
+
+        return "{} ({} {})".format(it.name, len(it.sweep), it.sweep.mode)
+
+
 class FunctionList(ItemList):
     def __init__(self, label, funcs, **kwargs):
         super().__init__(label, funcs, "select", **kwargs)
@@ -360,9 +400,294 @@ class FunctionList(ItemList):
         return it.__name__
 
 
-class JobList(ItemList):
-    def __init__(self, label, jobs, **kwargs):
-        super().__init__(label, jobs, "select", **kwargs)
+class PagedItemList(iw.VBox):
+    """
+    List of many items, which shows one page of the items that match the
+    filter text. Only the options of this page are sent to the browser.
+    `names` counts the names of the items, for lookups in constant time.
+
+    `index` is the position of the selected item in `item_list`, None if
+    none is selected, and `n_items` the length of `item_list`; both can be
+    observed.
+    """
+    index = traitlets.Any(None, allow_none=True)
+    n_items = traitlets.Int(0)
+
+    def __init__(self, label, items, page_size=50, **kwargs):
+        self.label = iw.Label(label)
+        self.item_list = list()
+        self.names = Counter()
+        self.page_size = page_size
+        self.page = 0
+        self._filter = ""
+        self._filtered = None
+        self._page_positions = list()
+        self._rendering = False
+
+        self.filter_text = iw.Text(
+            placeholder="filter", continuous_update=False,
+            layout=iw.Layout(width="auto"))
+        self.filter_text.observe(self.on_filter, names="value")
+        self.select = iw.Select(
+            options=tuple(), layout=iw.Layout(width="auto", height="100px"))
+        self.select.observe(self.on_select, names="index")
+        self.prev_bt = iw.Button(icon="chevron-left",
+                                 layout=iw.Layout(width="40px"))
+        self.prev_bt.on_click(lambda bt: self.show_page(self.page - 1))
+        self.next_bt = iw.Button(icon="chevron-right",
+                                 layout=iw.Layout(width="40px"))
+        self.next_bt.on_click(lambda bt: self.show_page(self.page + 1))
+        self.page_label = iw.Label()
+
+        self.valid_icon = iw.Valid()
+        self.valid_icon.layout.visibility = "hidden"
+        self.valid_timer = None
+        self.header = iw.HBox([self.label, self.valid_icon])
+        self.pager = iw.HBox([self.prev_bt, self.page_label, self.next_bt])
+
+        super().__init__([self.header, self.filter_text, self.select,
+                          self.pager], **kwargs)
+
+        self.sync_items(list(items) if items is not None else list())
+
+    @staticmethod
+    def get_item_str(it):
+        return it.name
+
+    @staticmethod
+    def get_item_name(it):
+        return it.name
+
+    raise_icon = ItemList.raise_icon
+
+    def get_positions(self):
+        if self._filtered is None:
+            return range(len(self.item_list))
+
+        return self._filtered
+
+    def get_n_pages(self):
+        return max(1, -(-len(self.get_positions()) // self.page_size))
+
+    def get_selected(self):
+        if self.index is None:
+            return None
+
+        return self.item_list[self.index]
+
+    def show_page(self, page):
+        self.page = min(max(page, 0), self.get_n_pages() - 1)
+        self.render()
+
+    def render(self):
+        positions = self.get_positions()
+        n_pages = self.get_n_pages()
+        self.page = min(self.page, n_pages - 1)
+        start = self.page * self.page_size
+        self._page_positions = list(positions[start:start + self.page_size])
+        options = tuple(self.get_item_str(self.item_list[i])
+                        for i in self._page_positions)
+
+        self._rendering = True
+        try:
+            if options != self.select.options:
+                self.select.options = options
+            if self.index in self._page_positions:
+                self.select.index = self._page_positions.index(self.index)
+            else:
+                self.select.index = None
+        finally:
+            self._rendering = False
+
+        self.page_label.value = "{}/{} ({})".format(
+            self.page + 1, n_pages, len(positions))
+        self.prev_bt.disabled = self.page == 0
+        self.next_bt.disabled = self.page == n_pages - 1
+        self.n_items = len(self.item_list)
+
+    def on_select(self, change):
+        if self._rendering:
+            return
+
+        if change["new"] is None:
+            self.index = None
+        else:
+            self.index = self._page_positions[change["new"]]
+
+    @traitlets.observe("index")
+    def on_index(self, change):
+        if self._rendering:
+            return
+
+        if change["new"] is None:
+            self.render()
+            return
+
+        # show the page of the selected item
+        if self._filtered is not None and change["new"] not in self._filtered:
+            self.filter_text.value = ""
+        positions = self.get_positions()
+        if self._filtered is None:
+            position = change["new"]
+        else:
+            position = positions.index(change["new"])
+        self.page = position // self.page_size
+        self.render()
+
+    def on_filter(self, change):
+        self._filter = change["new"].strip().lower()
+        self.update_filter()
+        self.page = 0
+        self.render()
+
+    def update_filter(self):
+        if not self._filter:
+            self._filtered = None
+            return
+
+        self._filtered = [i for i, it in enumerate(self.item_list)
+                          if self.matches_filter(it)]
+
+    def matches_filter(self, it):
+        return self._filter in self.get_item_str(it).lower()
+
+    def merge_filtered(self, filtered, inserted):
+        """
+        Positions of the matching items after the items at the ascending
+        final positions `inserted` were inserted, where `filtered` are the
+        positions of the matching items before.
+        """
+        merged = list()
+        j = 0
+        for i in filtered:
+            # the items before the i-th old item are moved by the insertions
+            while j < len(inserted) and inserted[j] <= i + j:
+                if self.matches_filter(self.item_list[inserted[j]]):
+                    merged.append(inserted[j])
+                j += 1
+            merged.append(i + j)
+
+        merged.extend(position for position in inserted[j:]
+                      if self.matches_filter(self.item_list[position]))
+
+        return merged
+
+    def set_index(self, index):
+        self._rendering = True
+        try:
+            self.index = index
+        finally:
+            self._rendering = False
+
+    def sync_items(self, items):
+        """
+        Replace all items, the selected item stays selected if it is still
+        listed.
+        """
+        selected = self.get_selected()
+        self.item_list = list(items)
+        self.names = Counter(self.get_item_name(it) for it in self.item_list)
+        self.update_filter()
+
+        index = None
+        if selected is not None:
+            for i, it in enumerate(self.item_list):
+                if it is selected:
+                    index = i
+                    break
+        self.set_index(index)
+        self.render()
+
+    def patch(self, removed=(), insertions=()):
+        """
+        Remove the items whose ids are in `removed`, then insert the items
+        of `insertions`, `(position, item)` pairs in ascending order of
+        the final positions, None appends. The page is rendered once.
+        """
+        selected = self.get_selected()
+        filtered = self._filtered
+        if removed:
+            matching = set(filtered or ())
+            kept = list()
+            filtered = None if filtered is None else list()
+            for i, it in enumerate(self.item_list):
+                if id(it) in removed:
+                    self.names[self.get_item_name(it)] -= 1
+                    continue
+
+                if i in matching:
+                    filtered.append(len(kept))
+                kept.append(it)
+            self.item_list = kept
+            # drops the names which are not listed anymore
+            self.names += Counter()
+
+        inserted = list()
+        for position, item in insertions:
+            if position is None:
+                position = len(self.item_list)
+            self.item_list.insert(position, item)
+            self.names[self.get_item_name(item)] += 1
+            inserted.append(position)
+
+        if filtered is not None:
+            self._filtered = self.merge_filtered(filtered, inserted)
+
+        index = None
+        if selected is not None:
+            for i, it in enumerate(self.item_list):
+                if it is selected:
+                    index = i
+                    break
+        self.set_index(index)
+        self.render()
+
+    def insert_items(self, position, items):
+        items = list(items)
+        self.item_list[position:position] = items
+        self.names.update(self.get_item_name(it) for it in items)
+        if self.index is not None and self.index >= position:
+            self.set_index(self.index + len(items))
+        if self._filtered is not None:
+            self._filtered = self.merge_filtered(
+                self._filtered, range(position, position + len(items)))
+        self.render()
+
+    def append_items(self, items):
+        self.insert_items(len(self.item_list), items)
+
+    def pop_item(self, index=None):
+        if index is None:
+            index = self.index
+
+        if index is None:
+            return
+
+        item = self.item_list.pop(index)
+        self.names[self.get_item_name(item)] -= 1
+        if self.names[self.get_item_name(item)] <= 0:
+            del self.names[self.get_item_name(item)]
+        if self.index == index:
+            self.set_index(None)
+        elif self.index is not None and self.index > index:
+            self.set_index(self.index - 1)
+        if self._filtered is not None:
+            k = bisect_left(self._filtered, index)
+            self._filtered[k:] = [i - 1 for i in self._filtered[k:]
+                                  if i != index]
+        self.render()
+
+        return item
+
+
+class JobList(PagedItemList):
+    pass
+
+
+class QueueJobList(JobList):
+    @staticmethod
+    def get_item_str(it):
+        return "[{}] {}".format(it.priority, it.name)
 
 
 class VisuJobList(ItemList):
@@ -411,9 +736,8 @@ class SchedulerForm(iw.VBox):
             description="Discard Function", icon="remove",
             layout=head_it_layout("delete_func_button"))
 
-        self.config_list = ItemList(
-            "Configurations", tuple(),
-            mode="select", layout=head_it_layout("config_list"))
+        self.config_list = ConfigList(
+            "Configurations", tuple(), layout=head_it_layout("config_list"))
         self.func_list = FunctionList(
             "Functions", tuple(),
             layout=head_it_layout("func_list"))
@@ -441,7 +765,7 @@ class SchedulerForm(iw.VBox):
             layout=head_it_layout("save_result_button"))
         self.busy_list = JobList(
             "Busy", tuple(), layout=head_it_layout("busy_list"))
-        self.queue_list = JobList(
+        self.queue_list = QueueJobList(
             "Queue", tuple(), layout=head_it_layout("queue_list"))
         self.result_list = JobList(
             "Results", tuple(), layout=head_it_layout("result_list"))
@@ -498,7 +822,7 @@ class SchedulerForm(iw.VBox):
         if not isinstance(config, Configuration):
             raise ValueError("Configuration has to be provided as object of "
                              "the type juts.Configuration.")
-        if config.name in self.config_list.select.options:
+        if config.name in [it.name for it in self.config_list.item_list]:
             self.config_list.raise_icon(False, "config names must be unique")
         else:
             self.config_list.append_items([config])
@@ -572,48 +896,168 @@ class UserInterfaceForm(iw.Tab):
         self.set_title(1, "Visualizer")
 
 
-class Plot(Thread, metaclass=ABCMeta):
+class RenderLoop(Thread):
+    """
+    Renders all started plots in one thread. Updates of a plot which arrive
+    while it waits for its next frame are coalesced into that frame. The
+    frame interval of a plot grows with its measured render duration, such
+    that rendering takes at most `max_load` of the time, hence frames are
+    dropped if the kernel is saturated. Invisible plots are not rendered
+    until they are shown again.
+    """
+    max_load = .25
+
+    def __init__(self):
+        super().__init__(name="juts render loop", daemon=True)
+        self.plots = list()
+        self.pending = set()
+        self.is_running = False
+        self._condition = Condition()
+
+    def add(self, plot):
+        with self._condition:
+            self.plots.append(plot)
+            self.pending.add(plot)
+            if not self.is_running:
+                self.is_running = True
+                self.start()
+            self._condition.notify()
+
+    def request(self, plot):
+        with self._condition:
+            if plot in self.plots:
+                self.pending.add(plot)
+                self._condition.notify()
+
+    def remove(self, plot):
+        with self._condition:
+            if plot in self.plots:
+                self.plots.remove(plot)
+            self.pending.discard(plot)
+
+    def get_frame_interval(self, plot):
+        n_visible = max(sum([p.visible for p in self.plots]), 1)
+        return max(plot.update_cycle,
+                   plot.frame_duration * n_visible / self.max_load)
+
+    def next_frame(self):
+        """
+        Return the plot to render next, else None and the time to wait.
+        """
+        now = time.monotonic()
+        timeout = min([plot.timeout for plot in self.plots], default=None)
+        for plot in sorted(self.plots, key=lambda p: p.last_update):
+            if not any([job.job_is_alive for job in plot.jobs]):
+                return plot, None
+
+            if plot not in self.pending or not plot.visible:
+                continue
+
+            due = plot.last_update + self.get_frame_interval(plot)
+            if due <= now:
+                return plot, None
+
+            timeout = min(timeout, due - now)
+
+        return None, timeout
+
+    def run(self):
+        while True:
+            with self._condition:
+                plot, timeout = self.next_frame()
+                while plot is None:
+                    self._condition.wait(timeout)
+                    plot, timeout = self.next_frame()
+
+                self.pending.discard(plot)
+
+            self.render(plot)
+
+    def render(self, plot):
+        is_alive = any([job.job_is_alive for job in plot.jobs])
+        t0 = time.monotonic()
+        try:
+            with plot.widget.hold_sync():
+                plot.update_plot()
+
+            if not is_alive:
+                plot.on_no_jobs_alive()
+
+        except Exception:
+            traceback.print_exc()
+            is_alive = False
+
+        plot.last_update = time.monotonic()
+        plot.frame_duration = plot.last_update - t0
+        if not is_alive:
+            self.remove(plot)
+            plot.finished.set()
+
+
+render_loop = None
+
+
+def get_render_loop():
+    global render_loop
+    if render_loop is None:
+        render_loop = RenderLoop()
+
+    return render_loop
+
+
+class Plot(metaclass=ABCMeta):
+    """
+    Base of the plots of the visualizer, rendered by the shared
+    :py:class:`RenderLoop` once started, until all jobs are finished.
+    """
     def __init__(self, jobs, widget, update_cycle=0.1, timeout=2,
                  jobs_valid=True):
-        super().__init__()
-
         self.jobs = jobs
         self.widget = widget
-        self.last_update = time.time()
+        self.last_update = time.monotonic()
         self.update_cycle = update_cycle
         self.timeout = timeout
         self.jobs_valid = jobs_valid
-        self.update_event = Event()
+        self.frame_duration = 0.
+        self.visible = True
+        self.render_loop = get_render_loop()
+        self.finished = Event()
+        self._started = False
 
         for job in jobs:
-            job.live_result_update.observe(self.on_live_result_update,
-                                           names="value")
+            job.live_result_update.connect(self.on_live_result_update)
+            job.job_finished.connect(self.on_job_finished)
 
-    def on_live_result_update(self, change):
-        self.update_event.set()
+    def on_live_result_update(self, columns=None):
+        self.request_update()
+
+    def on_job_finished(self, job):
+        self.request_update()
 
     def on_no_jobs_alive(self):
         pass
 
+    def request_update(self):
+        self.render_loop.request(self)
+
+    def set_visible(self, visible):
+        self.visible = visible
+        if visible:
+            self.request_update()
+
     @abstractmethod
     def update_plot(self, *args, **kwargs):
         pass
 
-    def run(self):
-        while any([job.job_is_alive for job in self.jobs]):
-            if self.update_event.wait(self.timeout):
-                self.update_event.clear()
-
-                cycle_margin = self.update_cycle - time.time() + self.last_update
-                self.last_update = time.time()
-                if cycle_margin > 0:
-                    time.sleep(cycle_margin)
+    def start(self):
+        self._started = True
+        self.render_loop.add(self)
 
-                with self.widget.hold_sync():
-                    self.update_plot()
+    def is_alive(self):
+        return self._started and not self.finished.is_set()
 
-        self.update_plot()
-        self.on_no_jobs_alive()
+    def join(self, timeout=None):
+        self.finished.wait(timeout)
 
 
 class ReplayPanel(iw.HBox):
@@ -688,7 +1132,9 @@ class ReplayPanel(iw.HBox):
                 time = job.result["time"]
                 min_times.append(time[0])
                 max_times.append(time[-1])
-                mean_times.append(np.mean(np.diff(time)))
+                # the mean step, without reading more than two samples
+                if len(time) > 1:
+                    mean_times.append((time[-1] - time[0]) / (len(time) - 1))
 
         if not min_times or not max_times:
             return
@@ -0,0 +1,315 @@
+from .transport import JobReturn, run_job, fork_lock, release_shared_arrays
+from multiprocessing import Process, Queue
+from threading import Lock, Thread
+from queue import Empty
+from weakref import WeakSet
+import traceback
+import atexit
+import pickle
+import os
+
+try:
+    import cloudpickle
+except ImportError:
+    cloudpickle = None
+
+
+class ProcessWorker:
+    """
+    Runs a single job in a freshly spawned process.
+    """
+    lost = False
+
+    def __init__(self):
+        self.process_queue = Queue()
+        self.process = None
+
+    def submit(self, func, config, cpus=None, resume_state=None):
+        self.process = Process(target=run_job,
+                               args=(func, config, self.process_queue, cpus,
+                                     resume_state))
+        with fork_lock:
+            self.process.start()
+
+    def is_alive(self):
+        return self.process is not None and self.process.is_alive()
+
+    def release(self):
+        self.process.join()
+
+    def terminate(self, timeout=1.):
+        if self.process is not None:
+            terminate_process(self.process, timeout)
+        drain_queue(self.process_queue)
+        close_queue(self.process_queue)
+
+    def cpu_time(self):
+        if self.process is None:
+            return 0.
+
+        return process_cpu_time(self.process.pid)
+
+
+class PoolWorker:
+    """
+    Long-lived process of a :py:class:`WorkerPool`, which runs one job after
+    another and keeps imported modules loaded in between. Status messages of
+    all jobs pass through the same `process_queue`; the
+    :py:class:`JobReturn` of a job is always its last message.
+    """
+    lost = False
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.n_jobs = 0
+        self.task_queue = Queue()
+        self.process_queue = Queue()
+        # not daemonic, hence job functions can start processes of their
+        # own; the pools are shut down on exit
+        self.process = Process(target=worker_loop,
+                               args=(self.task_queue, self.process_queue))
+        with fork_lock:
+            self.process.start()
+
+    def submit(self, func, config, cpus=None, resume_state=None):
+        self.n_jobs += 1
+        self.task_queue.put((dump_function(func), config, cpus, resume_state))
+
+    def is_alive(self):
+        return self.process.is_alive()
+
+    def release(self):
+        self.pool.release(self)
+
+    def stop(self):
+        if self.process.is_alive():
+            self.task_queue.put(None)
+        self.process.join()
+
+    def terminate(self, timeout=1.):
+        """
+        Abort the current job, the worker is discarded from the pool.
+        """
+        terminate_process(self.process, timeout)
+        drain_queue(self.process_queue)
+        close_queue(self.task_queue)
+        close_queue(self.process_queue)
+        self.pool.discard(self)
+
+    def memory(self):
+        return process_memory(self.process.pid)
+
+    def cpu_time(self):
+        return process_cpu_time(self.process.pid)
+
+
+class WorkerPool:
+    """
+    Set of warm :py:class:`PoolWorker` processes, started on demand and
+    reused for subsequent jobs.
+
+    Args:
+        max_jobs_per_worker: Recycle a worker after this number of jobs.
+        max_worker_memory: Recycle a worker once its resident memory
+            exceeds this number of bytes.
+    """
+    def __init__(self, max_jobs_per_worker=None, max_worker_memory=None):
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.max_worker_memory = max_worker_memory
+        self.size = 0
+        self.idle_workers = list()
+        self.busy_workers = list()
+        self._lock = Lock()
+        pools.add(self)
+
+    def acquire(self):
+        with self._lock:
+            while self.idle_workers:
+                worker = self.idle_workers.pop()
+                if worker.is_alive():
+                    break
+                worker.stop()
+
+            else:
+                worker = PoolWorker(self)
+
+            self.busy_workers.append(worker)
+
+        return worker
+
+    def release(self, worker):
+        with self._lock:
+            self.busy_workers.remove(worker)
+            n_workers = len(self.busy_workers) + len(self.idle_workers)
+            if self.needs_recycling(worker) or n_workers >= self.size:
+                worker.stop()
+
+            else:
+                self.idle_workers.append(worker)
+
+    def discard(self, worker):
+        with self._lock:
+            if worker in self.busy_workers:
+                self.busy_workers.remove(worker)
+
+    def needs_recycling(self, worker):
+        if not worker.is_alive():
+            return True
+
+        if (self.max_jobs_per_worker is not None
+                and worker.n_jobs >= self.max_jobs_per_worker):
+            return True
+
+        if self.max_worker_memory is not None:
+            memory = worker.memory()
+            if memory is not None and memory > self.max_worker_memory:
+                return True
+
+        return False
+
+    def resize(self, size):
+        """
+        Keep at most `size` workers, surplus idle workers are stopped and
+        busy ones when their job is done. Workers are started on demand.
+        """
+        with self._lock:
+            self.size = size
+            while (self.idle_workers and
+                   len(self.idle_workers) + len(self.busy_workers) > size):
+                self.idle_workers.pop().stop()
+
+    def shutdown(self, terminate=False):
+        """
+        Stop the idle workers, the busy ones when their job is done or
+        right away if `terminate`.
+        """
+        self.resize(0)
+        if terminate:
+            with self._lock:
+                busy_workers = list(self.busy_workers)
+            for worker in busy_workers:
+                terminate_process(worker.process)
+
+
+# the workers are not daemonic, hence multiprocessing would wait for them
+# on exit; this hook is registered later and runs before
+pools = WeakSet()
+
+
+def shutdown_pools():
+    for pool in list(pools):
+        pool.shutdown(terminate=True)
+
+
+atexit.register(shutdown_pools)
+
+
+def worker_loop(task_queue, process_queue):
+    while True:
+        task = task_queue.get()
+        if task is None:
+            return
+
+        func, config, cpus, resume_state = task
+        try:
+            func = pickle.loads(func)
+
+        except Exception:
+            traceback.print_exc()
+            process_queue.put(JobReturn(dict(), completed=False))
+            continue
+
+        try:
+            run_job(func, config, process_queue, cpus, resume_state)
+
+        except Exception:
+            traceback.print_exc()
+
+
+def dump_function(func):
+    """
+    Pickle `func` for a worker which was started before `func` was defined,
+    by value if cloudpickle is available.
+    """
+    if cloudpickle is not None:
+        return cloudpickle.dumps(func)
+
+    return pickle.dumps(func)
+
+
+def process_memory(pid):
+    """
+    Resident memory of the process `pid` in bytes, None if unknown.
+    """
+    try:
+        with open("/proc/{}/statm".format(pid), "r") as f:
+            resident_pages = int(f.read().split()[1])
+
+    except (OSError, ValueError, IndexError):
+        return None
+
+    return resident_pages * os.sysconf("SC_PAGE_SIZE")
+
+
+def process_cpu_time(pid):
+    """
+    User and system cpu time of the process `pid` in seconds, None if
+    unknown.
+    """
+    try:
+        with open("/proc/{}/stat".format(pid), "r") as f:
+            # the command name may contain spaces, it ends with ")"
+            fields = f.read().rsplit(")", 1)[1].split()
+            ticks = int(fields[11]) + int(fields[12])
+
+    except (OSError, ValueError, IndexError):
+        return None
+
+    return ticks / os.sysconf("SC_CLK_TCK")
+
+
+def terminate_process(process, timeout=1.):
+    """
+    Terminate `process`, kill it if it is still alive after `timeout`
+    seconds.
+    """
+    if process.is_alive():
+        process.terminate()
+        process.join(timeout)
+
+    if process.is_alive():
+        process.kill()
+    process.join()
+
+
+def drain_queue(queue, timeout=1.):
+    """
+    Release the shared arrays of the messages left in the queue of a
+    terminated process. A message which the process only partly wrote
+    blocks the reader, hence the queue is read in a daemon thread for at
+    most `timeout` seconds.
+    """
+    def drain():
+        while True:
+            try:
+                status = queue.get(timeout=.01)
+
+            except Empty:
+                return
+
+            except (OSError, ValueError, EOFError, pickle.UnpicklingError):
+                # the queue got closed or a message is corrupt
+                return
+
+            release_shared_arrays(status)
+
+    thread = Thread(target=drain, daemon=True)
+    thread.start()
+    thread.join(timeout)
+
+
+def close_queue(queue):
+    # the process at the other end is gone, hence do not wait for the
+    # feeder thread to flush
+    queue.cancel_join_thread()
+    queue.close()
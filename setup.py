@@ -21,6 +21,9 @@ setuptools.setup(
     long_description=description,
     packages=setuptools.find_packages(),
     install_requires=read_file("requirements.txt"),
+    entry_points={
+        "console_scripts": ["juts-agent=juts.remote:main"],
+    },
     classifiers=(
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: BSD License",